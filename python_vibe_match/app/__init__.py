@@ -2,6 +2,16 @@
 Application package for managing vibes data and web interface.
 """
 
-from . import vibes  # re-export for convenience
+from __future__ import annotations
+
+import importlib
 
 __all__ = ["vibes"]
+
+
+def __getattr__(name: str):
+    # Loaded on first access so `import app` stays cheap for CLI commands
+    # that never touch the vibes facade.
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,266 @@
+"""Async counterparts of :mod:`app.vibes` for the FastAPI request path.
+
+The SQL, row mapping and scoring are shared with the synchronous module, which
+remains the facade used by the CLI.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from dataclasses import asdict
+from typing import List, Optional
+
+from .cache import TTLCache
+from .db import get_async_connection
+from .embeddings import embed_text_async, embed_vector_async
+from .errors import DatabaseError, EmbeddingError, NormalizationError
+from . import metrics
+from .ranking import RankWeights, vibe_terms
+from .replica import get_replica
+from .settings import get_settings
+from .text_normalization import normalize_text
+from .vibes import (
+    _FETCH_SQL,
+    _LIST_SQL,
+    _SIMILAR_ITERATIVE_SCAN_SQL,
+    _UNCHANGED_SQL,
+    _UPSERT_SQL,
+    _WIPE_SQL,
+    SearchResult,
+    Vibe,
+    VibePage,
+    _candidate_pool,
+    _page_statement,
+    _record_upserts,
+    _resolve_search_mode,
+    _row_to_vibe,
+    _score_rows,
+    _search_results,
+    _search_statement,
+    _search_tuning,
+    _similar_results,
+    _similar_sql,
+    _to_page,
+    _unchanged_records,
+)
+
+# Short-lived cache for the "recent vibes" sidebar rendered on every page.
+_RECENT_VIBES: TTLCache[int, List[Vibe]] = TTLCache(
+    maxsize=8, ttl=get_settings().recent_vibes_ttl
+)
+# JSON API results keyed by search_fingerprint(); entries for older table
+# versions simply stop being requested and age out.
+_SEARCH_RESULTS: TTLCache[str, List[SearchResult]] = TTLCache(
+    maxsize=get_settings().search_cache_size, ttl=get_settings().search_cache_ttl
+)
+_SEARCH_VERSION_SQL = """
+SELECT (SELECT sum(version)::bigint FROM vibes_version),
+       (SELECT built_at FROM vibes_index_config);
+"""
+
+
+def _clear_caches() -> None:
+    _RECENT_VIBES.clear()
+    _SEARCH_RESULTS.clear()
+
+
+async def upsert_vibe(uid: str, vibe: str) -> bool:
+    settings = get_settings()
+    original_vibe = vibe.strip()
+
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(_UNCHANGED_SQL, ([uid], settings.active_embedding_model))
+            unchanged = _unchanged_records(await cur.fetchall(), [(uid, original_vibe)])
+    except Exception as exc:  # pragma: no cover - DB errors
+        raise DatabaseError(f"Failed to upsert vibe: {exc}") from exc
+
+    if unchanged:
+        _record_upserts(unchanged=1)
+        return False
+
+    try:
+        processed_vibe = await asyncio.to_thread(normalize_text, vibe)
+    except NormalizationError as exc:
+        raise EmbeddingError(str(exc)) from exc
+
+    embedding = await embed_text_async(processed_vibe, already_normalized=True)
+
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(
+                _UPSERT_SQL,
+                (
+                    uid,
+                    original_vibe,
+                    processed_vibe,
+                    embedding,
+                    settings.active_embedding_model,
+                    vibe_terms(original_vibe),
+                ),
+            )
+    except Exception as exc:  # pragma: no cover - DB errors
+        raise DatabaseError(f"Failed to upsert vibe: {exc}") from exc
+    finally:
+        _clear_caches()
+
+    _record_upserts(written=1)
+    return True
+
+
+async def fetch_vibe(uid: str) -> Optional[Vibe]:
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(_FETCH_SQL, (uid,))
+            row = await cur.fetchone()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to fetch vibe: {exc}") from exc
+
+    return _row_to_vibe(row) if row else None
+
+
+async def list_vibes(limit: int = 20) -> List[Vibe]:
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(_LIST_SQL, (limit,))
+            rows = await cur.fetchall()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to list vibes: {exc}") from exc
+
+    return [_row_to_vibe(row) for row in rows]
+
+
+async def list_vibes_page(limit: int = 20, cursor: Optional[str] = None) -> VibePage:
+    statement, params = _page_statement(limit, cursor)
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(statement, params)
+            rows = await cur.fetchall()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to list vibes: {exc}") from exc
+
+    return _to_page(rows, limit)
+
+
+async def list_recent_vibes(limit: int = 20) -> List[Vibe]:
+    """:func:`list_vibes` served from a short-TTL cache cleared on writes."""
+    cached = _RECENT_VIBES.get(limit)
+    if cached is not None:
+        return cached
+
+    records = await list_vibes(limit)
+    _RECENT_VIBES.set(limit, records)
+    return records
+
+
+async def search_vibes(
+    query: str,
+    top_k: int = 5,
+    *,
+    mode: Optional[str] = None,
+    weights: Optional[RankWeights] = None,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[SearchResult]:
+    mode = _resolve_search_mode(mode)
+    replica = get_replica()
+    if (
+        replica is not None
+        and replica.fresh()
+        and mode == "rerank"
+        and probes is None
+        and ef_search is None
+    ):
+        vector = await embed_vector_async(query)
+        with metrics.timed("replica_query"):
+            rows = await asyncio.to_thread(replica.search, vector, _candidate_pool(top_k))
+        return _score_rows(query, rows, top_k, weights)
+
+    embedding = await embed_text_async(query)
+    statement, params = _search_statement(query, embedding, top_k, mode, weights)
+    tuning = _search_tuning(probes, ef_search, _candidate_pool(top_k))
+
+    try:
+        async with get_async_connection() as conn, conn.transaction(), conn.cursor() as cur:
+            await cur.execute(*tuning)
+            with metrics.timed("ann_query"):
+                await cur.execute(statement, params)
+                rows = await cur.fetchall()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to search vibes: {exc}") from exc
+
+    return _search_results(query, rows, top_k, mode, weights)
+
+
+async def find_similar(uid: str, top_k: int = 5) -> Optional[List[SearchResult]]:
+    pool = _candidate_pool(top_k)
+    try:
+        async with get_async_connection() as conn, conn.transaction(), conn.cursor() as cur:
+            await cur.execute(*_search_tuning(None, None, pool))
+            await cur.execute(_SIMILAR_ITERATIVE_SCAN_SQL)
+            await cur.execute(_similar_sql(), {"uids": [uid], "pool": pool})
+            rows = await cur.fetchall()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to find similar vibes: {exc}") from exc
+
+    return _similar_results(rows, [uid], top_k).get(uid)
+
+
+async def search_fingerprint(query: str, top_k: int) -> str:
+    """Digest of everything that determines ``search_vibes(query, top_k)``.
+
+    Covers the case- and whitespace-normalized query, ``top_k``, the search
+    and index configuration and the ``vibes_version`` counter bumped by every
+    write, so it doubles as the cache key and the HTTP ETag.
+    """
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(_SEARCH_VERSION_SQL)
+            table_version, index_built_at = await cur.fetchone()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to read vibes version: {exc}") from exc
+
+    settings = get_settings()
+    parts = [
+        " ".join(query.casefold().split()),
+        top_k,
+        table_version,
+        index_built_at.isoformat() if index_built_at else None,
+        settings.active_embedding_model,
+        settings.search_mode,
+        settings.embedding_storage,
+        settings.compact_embedding_dimension,
+        settings.compact_rescore,
+        settings.search_model_filter,
+        settings.search_candidate_multiplier,
+        settings.ivfflat_probes,
+        settings.hnsw_ef_search,
+        asdict(RankWeights.from_settings()),
+    ]
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+async def search_vibes_cached(query: str, top_k: int, fingerprint: str) -> List[SearchResult]:
+    """:func:`search_vibes` memoized under ``fingerprint`` (see :func:`search_fingerprint`)."""
+    cached = _SEARCH_RESULTS.get(fingerprint)
+    if cached is not None:
+        metrics.increment("search_cache_hits_total")
+        return cached
+    metrics.increment("search_cache_misses_total")
+
+    results = await search_vibes(query, top_k)
+    _SEARCH_RESULTS.set(fingerprint, results)
+    return results
+
+
+async def wipe_vibes() -> None:
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(_WIPE_SQL)
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to wipe vibes table: {exc}") from exc
+    finally:
+        _clear_caches()
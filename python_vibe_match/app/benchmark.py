@@ -0,0 +1,293 @@
+"""Recall/latency benchmark for vibe search on synthetic data.
+
+Vibes are synthesized from a small topic vocabulary and embedded with a
+deterministic local hash embedder, loaded into a scratch ``vibes_bench`` table,
+and every index configuration is measured against exact search computed in
+NumPy. No OpenAI calls are made.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import psycopg
+from pgvector.psycopg import register_vector, to_db
+from psycopg import sql
+
+from .embedding_backends import hash_embedding
+from .errors import DatabaseError
+from .indexing import IndexPlan, create_index_sql
+from .ranking import RankWeights, rerank, vibe_terms
+from .settings import get_settings
+
+BENCH_TABLE = "vibes_bench"
+DEFAULT_CONFIGS = (
+    "exact",
+    "ivfflat:lists=100,probes=1",
+    "ivfflat:lists=100,probes=10",
+    "hnsw:m=16,ef_search=40",
+    "hnsw:m=16,ef_search=100",
+)
+
+_TOPICS = [
+    "rubber duck debugging", "pair programming", "late night coding", "rust", "go",
+    "python", "c plus plus", "shell scripting", "kernel hacking", "web design",
+    "machine learning", "data science", "chess", "board games", "climbing",
+    "running", "football", "basketball", "cooking", "baking", "photography",
+    "guitar", "piano", "jazz", "techno", "film club", "anime", "spanish",
+    "french", "german", "japanese", "hackathons", "open source", "game jams",
+    "robotics", "electronics", "3d printing", "cybersecurity", "ctf challenges",
+    "devops", "docker", "databases", "algorithms", "competitive programming",
+]
+_CAMPUSES = [
+    "paris", "berlin", "heilbronn", "wolfsburg", "madrid", "barcelona", "lisbon",
+    "porto", "rome", "vienna", "prague", "warsaw", "amsterdam", "brussels",
+    "tokyo", "seoul", "singapore", "bangkok", "abu dhabi", "quebec",
+]
+_PREFIXES = [
+    "i want to practice", "looking for people into", "i would like to learn",
+    "happy to mentor", "always up for", "searching for a buddy for",
+]
+
+
+@dataclass
+class ConfigResult:
+    config: str
+    recall_at_k: float
+    rerank_recall_at_k: float
+    qps: float
+    latency_ms: Dict[str, float]
+    build_seconds: float
+
+
+@dataclass
+class BenchmarkReport:
+    generated_at: str
+    rows: int
+    queries: int
+    top_k: int
+    dimension: int
+    candidate_multiplier: int
+    results: List[ConfigResult] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def synthesize_vibes(count: int, *, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    vibes = []
+    for _ in range(count):
+        topics = rng.sample(_TOPICS, rng.randint(1, 3))
+        # Campus and cohort tokens keep near-duplicate vibes from tying exactly,
+        # which would make recall depend on arbitrary tie-breaking.
+        vibes.append(
+            f"{rng.choice(_PREFIXES)} {' and '.join(topics)} "
+            f"at {rng.choice(_CAMPUSES)} cohort{rng.randint(1, 5000)}"
+        )
+    return vibes
+
+
+def parse_config(spec: str) -> IndexPlan:
+    """Parse ``strategy[:key=value,...]``, e.g. ``hnsw:m=16,ef_search=80``."""
+    strategy, _, options = spec.partition(":")
+    plan = IndexPlan(strategy=strategy.strip(), row_count=0)
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        key = key.strip()
+        if key not in {"lists", "probes", "m", "ef_construction", "ef_search"}:
+            raise ValueError(f"Unknown benchmark option '{key}' in '{spec}'.")
+        setattr(plan, key, int(value))
+
+    if plan.strategy == "ivfflat":
+        plan.lists = plan.lists or 100
+        plan.probes = plan.probes or 10
+    elif plan.strategy == "hnsw":
+        plan.m = plan.m or 16
+        plan.ef_construction = plan.ef_construction or 64
+        plan.ef_search = plan.ef_search or 40
+    elif plan.strategy != "exact":
+        raise ValueError(f"Unknown index strategy '{plan.strategy}'.")
+    return plan
+
+
+def _load_table(conn: psycopg.Connection, vibes: Sequence[str], matrix: np.ndarray) -> None:
+    dimension = matrix.shape[1]
+    now = datetime.now(UTC)
+    rng = random.Random(7)
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {};").format(sql.Identifier(BENCH_TABLE)))
+        cur.execute(
+            sql.SQL(
+                """
+                CREATE TABLE {} (
+                    uid TEXT PRIMARY KEY,
+                    original_vibe TEXT NOT NULL,
+                    embedding VECTOR({}) NOT NULL,
+                    vibe_terms TEXT[] NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL
+                );
+                """
+            ).format(sql.Identifier(BENCH_TABLE), sql.Literal(dimension))
+        )
+        copy_sql = sql.SQL(
+            "COPY {} (uid, original_vibe, embedding, vibe_terms, updated_at) FROM STDIN"
+        ).format(sql.Identifier(BENCH_TABLE))
+        with cur.copy(copy_sql) as copy:
+            for position, (vibe, vector) in enumerate(zip(vibes, matrix)):
+                copy.write_row(
+                    (
+                        f"bench-{position}",
+                        vibe,
+                        to_db(vector),
+                        vibe_terms(vibe),
+                        now - timedelta(days=rng.uniform(0, 180)),
+                    )
+                )
+        cur.execute(sql.SQL("ANALYZE {};").format(sql.Identifier(BENCH_TABLE)))
+
+
+def _apply_config(conn: psycopg.Connection, plan: IndexPlan) -> float:
+    index_name = f"{BENCH_TABLE}_embedding_idx"
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP INDEX IF EXISTS {};").format(sql.Identifier(index_name)))
+        if plan.strategy != "exact":
+            cur.execute(create_index_sql(plan, index_name, concurrently=False, table=BENCH_TABLE))
+        cur.execute(
+            "SELECT set_config('ivfflat.probes', %s, false), set_config('hnsw.ef_search', %s, false);",
+            (str(plan.probes or 1), str(plan.ef_search or 40)),
+        )
+    return time.perf_counter() - started
+
+
+def _rerank_uids(query: str, rows, top_k: int, weights: RankWeights) -> List[str]:
+    ranked = rerank(
+        query,
+        [row[1] for row in rows],
+        [row[2] for row in rows],
+        [row[3] for row in rows],
+        top_k,
+        document_terms=[row[4] for row in rows],
+        weights=weights,
+        min_score=float("-inf"),
+    )
+    return [rows[candidate.index][0] for candidate in ranked]
+
+
+def run_benchmark(
+    configs: Sequence[str],
+    *,
+    rows: int = 10_000,
+    queries: int = 200,
+    top_k: int = 10,
+    dimension: int = 256,
+    candidate_multiplier: Optional[int] = None,
+    keep_table: bool = False,
+) -> BenchmarkReport:
+    settings = get_settings()
+    plans = [(spec, parse_config(spec)) for spec in configs]
+    multiplier = candidate_multiplier or settings.search_candidate_multiplier
+    pool = top_k * multiplier
+    weights = RankWeights.from_settings()
+
+    corpus = synthesize_vibes(rows)
+    query_texts = synthesize_vibes(queries, seed=1337)
+    matrix = np.array([hash_embedding(text, dimension) for text in corpus], dtype=np.float32)
+    query_matrix = np.array(
+        [hash_embedding(text, dimension) for text in query_texts], dtype=np.float32
+    )
+
+    report = BenchmarkReport(
+        generated_at=datetime.now(UTC).isoformat(),
+        rows=rows,
+        queries=queries,
+        top_k=top_k,
+        dimension=dimension,
+        candidate_multiplier=multiplier,
+    )
+
+    search_sql = sql.SQL(
+        """
+        SELECT uid, original_vibe, embedding <=> %s::vector AS distance, updated_at, vibe_terms
+        FROM {}
+        ORDER BY embedding <=> %s::vector
+        LIMIT %s;
+        """
+    ).format(sql.Identifier(BENCH_TABLE))
+    fetch_sql = sql.SQL(
+        """
+        SELECT uid, original_vibe, embedding <=> %s::vector AS distance, updated_at, vibe_terms
+        FROM {}
+        WHERE uid = ANY(%s);
+        """
+    ).format(sql.Identifier(BENCH_TABLE))
+
+    # The scratch table lives outside the pool-configured connections; errors
+    # are wrapped like app.db's so callers only handle DatabaseError.
+    try:
+        with psycopg.connect(settings.database_url, autocommit=True) as conn:
+            conn.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+            register_vector(conn)
+            _load_table(conn, corpus, matrix)
+
+            # Ground truth from exact cosine similarity over the in-memory matrix.
+            similarities = query_matrix @ matrix.T
+            exact_order = np.argsort(-similarities, axis=1)[:, :pool]
+            exact_top_k = [{f"bench-{i}" for i in row[:top_k]} for row in exact_order]
+            exact_reranked = []
+            with conn.cursor() as cur:
+                for text, vector, order in zip(query_texts, query_matrix, exact_order):
+                    literal = to_db(vector)
+                    cur.execute(fetch_sql, (literal, [f"bench-{i}" for i in order]))
+                    exact_reranked.append(set(_rerank_uids(text, cur.fetchall(), top_k, weights)))
+
+            try:
+                for spec, plan in plans:
+                    build_seconds = _apply_config(conn, plan)
+                    latencies = []
+                    ann_hits = 0
+                    rerank_hits = 0
+                    with conn.cursor() as cur:
+                        for position, (text, vector) in enumerate(zip(query_texts, query_matrix)):
+                            literal = to_db(vector)
+                            started = time.perf_counter()
+                            cur.execute(search_sql, (literal, literal, pool))
+                            result_rows = cur.fetchall()
+                            latencies.append(time.perf_counter() - started)
+
+                            ann_hits += len(
+                                {row[0] for row in result_rows[:top_k]} & exact_top_k[position]
+                            )
+                            rerank_hits += len(
+                                set(_rerank_uids(text, result_rows, top_k, weights))
+                                & exact_reranked[position]
+                            )
+
+                    elapsed = np.array(latencies) * 1000.0
+                    report.results.append(
+                        ConfigResult(
+                            config=spec,
+                            recall_at_k=ann_hits / (queries * top_k),
+                            rerank_recall_at_k=rerank_hits / (queries * top_k),
+                            qps=queries / float(np.sum(latencies)),
+                            latency_ms={
+                                "p50": float(np.percentile(elapsed, 50)),
+                                "p95": float(np.percentile(elapsed, 95)),
+                                "p99": float(np.percentile(elapsed, 99)),
+                            },
+                            build_seconds=build_seconds,
+                        )
+                    )
+            finally:
+                if not keep_table:
+                    conn.execute(sql.SQL("DROP TABLE IF EXISTS {};").format(sql.Identifier(BENCH_TABLE)))
+    except psycopg.Error as exc:
+        raise DatabaseError(f"Benchmark failed: {exc}") from exc
+
+    return report
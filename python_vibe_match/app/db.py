@@ -1,64 +1,202 @@
 from __future__ import annotations
 
-from contextlib import contextmanager
-from typing import Iterator
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Iterator
 
 import psycopg
-from psycopg import sql
-from pgvector.psycopg import register_vector
+from pgvector.psycopg import register_vector, register_vector_async
+from psycopg_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
 
+from . import metrics
 from .errors import DatabaseError
-from .settings import get_settings
+from .settings import DEFAULT_HNSW_EF_SEARCH, DEFAULT_IVFFLAT_PROBES, get_settings
 
-_SCHEMA_PATCHED = False
+_ASYNC_POOL: AsyncConnectionPool | None = None
+_ASYNC_POOL_LOCK = asyncio.Lock()
 
 
-def _ensure_vibes_schema(conn: psycopg.Connection) -> None:
-    global _SCHEMA_PATCHED
-    if _SCHEMA_PATCHED:
-        return
+_INDEX_CONFIG_EXISTS_SQL = "SELECT to_regclass('vibes_index_config') IS NOT NULL;"
+_INDEX_TUNING_SQL = "SELECT probes, ef_search FROM vibes_index_config;"
+_SESSION_TUNING_SQL = (
+    "SELECT set_config('ivfflat.probes', %s, false), set_config('hnsw.ef_search', %s, false);"
+)
+_VECTOR_VERSION_SQL = "SELECT extversion FROM pg_extension WHERE extname = 'vector';"
+# pgvector 0.8+ keeps scanning the index until enough rows pass a WHERE
+# clause; without it a model filter can leave fewer than ef_search results.
+_ITERATIVE_SCAN_SQL = (
+    "SELECT set_config('hnsw.iterative_scan', 'relaxed_order', false), "
+    "set_config('ivfflat.iterative_scan', 'relaxed_order', false);"
+)
 
+
+def _session_tuning(recorded) -> tuple[str, str]:
+    """Resolve search-time index knobs: explicit settings, then the values
+    recorded by ``manage_vibes.py index``, then library defaults."""
+    settings = get_settings()
+    recorded_probes, recorded_ef_search = recorded or (None, None)
+    probes = settings.ivfflat_probes or recorded_probes or DEFAULT_IVFFLAT_PROBES
+    ef_search = settings.hnsw_ef_search or recorded_ef_search or DEFAULT_HNSW_EF_SEARCH
+    return str(probes), str(ef_search)
+
+
+def _wants_iterative_scan(extversion) -> bool:
+    """Only filtered searches need it, and older pgvector rejects the GUCs."""
+    if not get_settings().search_model_filter or not extversion:
+        return False
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_schema = current_schema()
-                  AND table_name = 'vibes';
-                """
-            )
-            columns = {row[0] for row in cur.fetchall()}
+        major, minor = (int(part) for part in extversion[0].split(".")[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (0, 8)
 
-            if "original_vibe" not in columns:
-                cur.execute("ALTER TABLE vibes ADD COLUMN original_vibe TEXT;")
-                cur.execute("UPDATE vibes SET original_vibe = vibe;")
-                cur.execute(
-                    "ALTER TABLE vibes ALTER COLUMN original_vibe SET NOT NULL;"
-                )
-    except Exception as exc:
-        raise DatabaseError(f"Failed to ensure vibes schema: {exc}") from exc
 
-    _SCHEMA_PATCHED = True
+def _configure_connection(conn: psycopg.Connection) -> None:
+    """Prepare a freshly opened pooled connection; runs once per connection."""
+    register_vector(conn)
+    with conn.cursor() as cur:
+        recorded = None
+        cur.execute(_INDEX_CONFIG_EXISTS_SQL)
+        if cur.fetchone()[0]:
+            cur.execute(_INDEX_TUNING_SQL)
+            recorded = cur.fetchone()
+        cur.execute(_SESSION_TUNING_SQL, _session_tuning(recorded))
+        cur.execute(_VECTOR_VERSION_SQL)
+        if _wants_iterative_scan(cur.fetchone()):
+            cur.execute(_ITERATIVE_SCAN_SQL)
 
 
-@contextmanager
-def get_connection() -> Iterator[psycopg.Connection]:
+async def _configure_async_connection(conn: psycopg.AsyncConnection) -> None:
+    await register_vector_async(conn)
+    async with conn.cursor() as cur:
+        recorded = None
+        await cur.execute(_INDEX_CONFIG_EXISTS_SQL)
+        if (await cur.fetchone())[0]:
+            await cur.execute(_INDEX_TUNING_SQL)
+            recorded = await cur.fetchone()
+        await cur.execute(_SESSION_TUNING_SQL, _session_tuning(recorded))
+        await cur.execute(_VECTOR_VERSION_SQL)
+        if _wants_iterative_scan(await cur.fetchone()):
+            await cur.execute(_ITERATIVE_SCAN_SQL)
+
+
+def _pool_kwargs() -> dict:
     settings = get_settings()
+    return {
+        "conninfo": settings.database_url,
+        "kwargs": {"autocommit": True},
+        "min_size": settings.db_pool_min_size,
+        "max_size": settings.db_pool_max_size,
+        "timeout": settings.db_pool_timeout,
+        "max_idle": settings.db_pool_max_idle,
+    }
+
+
+@lru_cache(maxsize=1)
+def get_pool() -> ConnectionPool:
     try:
-        conn = psycopg.connect(settings.database_url, autocommit=True)
-        register_vector(conn)
-        _ensure_vibes_schema(conn)
-        with conn.cursor() as cur:
-            cur.execute(
-                sql.SQL("SET ivfflat.probes = {}").format(
-                    sql.Literal(settings.ivfflat_probes)
-                )
-            )
+        pool = ConnectionPool(
+            **_pool_kwargs(),
+            configure=_configure_connection,
+            check=ConnectionPool.check_connection,
+            name="vibes",
+            open=False,
+        )
+        pool.open()
     except Exception as exc:  # pragma: no cover - connection errors bubble up
+        raise DatabaseError(f"Failed to create connection pool: {exc}") from exc
+    return pool
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """Return the process-wide async pool, opening it on first use.
+
+    The pool must be opened from inside a running event loop, so it cannot be
+    created lazily through ``lru_cache`` like its synchronous sibling.
+    """
+    global _ASYNC_POOL
+    if _ASYNC_POOL is not None:
+        return _ASYNC_POOL
+
+    async with _ASYNC_POOL_LOCK:
+        if _ASYNC_POOL is None:
+            pool = AsyncConnectionPool(
+                **_pool_kwargs(),
+                configure=_configure_async_connection,
+                check=AsyncConnectionPool.check_connection,
+                name="vibes-async",
+                open=False,
+            )
+            try:
+                await pool.open()
+            except Exception as exc:  # pragma: no cover - connection errors bubble up
+                raise DatabaseError(f"Failed to create connection pool: {exc}") from exc
+            _ASYNC_POOL = pool
+    return _ASYNC_POOL
+
+
+@contextmanager
+def get_connection() -> Iterator[psycopg.Connection]:
+    pool = get_pool()
+    started = time.perf_counter()
+    try:
+        with pool.connection() as conn:
+            metrics.observe("db_connect", time.perf_counter() - started)
+            yield conn
+    except (PoolTimeout, psycopg.OperationalError) as exc:  # pragma: no cover
         raise DatabaseError(f"Failed to connect to database: {exc}") from exc
 
+
+@asynccontextmanager
+async def get_async_connection() -> AsyncIterator[psycopg.AsyncConnection]:
+    pool = await get_async_pool()
+    started = time.perf_counter()
+    try:
+        async with pool.connection() as conn:
+            metrics.observe("db_connect", time.perf_counter() - started)
+            yield conn
+    except (PoolTimeout, psycopg.OperationalError) as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to connect to database: {exc}") from exc
+
+
+def check_database() -> bool:
+    """Round-trip a trivial query through the pool; used by health checks."""
     try:
-        yield conn
-    finally:
-        conn.close()
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+            return cur.fetchone() == (1,)
+    except Exception:
+        return False
+
+
+async def check_database_async() -> bool:
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute("SELECT 1;")
+            return await cur.fetchone() == (1,)
+    except Exception:
+        return False
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    stats: dict[str, dict[str, int]] = {}
+    if get_pool.cache_info().currsize:
+        stats["sync"] = get_pool().get_stats()
+    if _ASYNC_POOL is not None:
+        stats["async"] = _ASYNC_POOL.get_stats()
+    return stats
+
+
+def close_pools() -> None:
+    if get_pool.cache_info().currsize:
+        get_pool().close()
+        get_pool.cache_clear()
+
+
+async def close_async_pool() -> None:
+    global _ASYNC_POOL
+    if _ASYNC_POOL is not None:
+        await _ASYNC_POOL.close()
+        _ASYNC_POOL = None
@@ -0,0 +1,346 @@
+"""Embedding backends selectable through ``EMBEDDING_BACKEND``.
+
+Backends return raw (not unit-normalized) vectors in input order;
+:mod:`app.embeddings` handles normalization, caching and batching on top.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import random
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Tuple
+
+import numpy as np
+
+from . import metrics
+from .errors import EmbeddingError
+from .settings import get_settings
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+# openai/httpx take most of a second to import, so they are only loaded once
+# an OpenAI client is actually needed.
+@lru_cache(maxsize=1)
+def _retryable_errors() -> Tuple[type, ...]:
+    """Errors worth retrying: throttling, transient network failures and 5xx."""
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+
+class _CountMismatchError(EmbeddingError):
+    """The API answered with a different number of vectors than it was sent texts."""
+
+
+def is_input_error(exc: BaseException) -> bool:
+    """Whether ``exc`` may have been caused by one of the request's texts.
+
+    That is a 400 from OpenAI or a response with the wrong number of vectors;
+    authentication, permission, unknown-model and outage errors would fail
+    every text alike.
+    """
+    if isinstance(exc, _CountMismatchError):
+        return True
+    # Only the OpenAI backend raises API errors, and only it imports openai.
+    if "openai" not in sys.modules:
+        return False
+    import openai
+
+    return isinstance(exc.__cause__, openai.BadRequestError)
+
+
+class EmbeddingBackend(ABC):
+    """Turns a batch of texts into vectors of ``embedding_dimension`` floats."""
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+    async def aclose(self) -> None:
+        return None
+
+    def warm_up(self) -> None:
+        """Load clients or models ahead of the first request."""
+        return None
+
+
+_MAX_BACKOFF = 30.0
+
+
+def _http_options() -> dict:
+    """Timeout and pool limits shared by the sync and async httpx clients.
+
+    Keep-alive connections are sized to the concurrency cap so bursts reuse
+    warm TLS connections instead of opening new ones.
+    """
+    import httpx
+
+    settings = get_settings()
+    return {
+        "trust_env": False,
+        "timeout": httpx.Timeout(settings.embedding_request_timeout, connect=5.0),
+        "limits": httpx.Limits(
+            max_connections=settings.embedding_max_concurrency * 2,
+            max_keepalive_connections=settings.embedding_max_concurrency,
+            keepalive_expiry=settings.embedding_keepalive_expiry,
+        ),
+    }
+
+
+@lru_cache(maxsize=1)
+def _get_client() -> OpenAI:
+    import httpx
+    from openai import OpenAI
+
+    settings = get_settings()
+    if not settings.openai_api_key:
+        raise EmbeddingError(
+            "OPENAI_API_KEY environment variable is required to create embeddings."
+        )
+
+    client_kwargs = {
+        "api_key": settings.openai_api_key,
+        "http_client": httpx.Client(**_http_options()),
+        # Retries are handled by OpenAIBackend so they can back off per batch.
+        "max_retries": 0,
+    }
+
+    if settings.openai_base_url:
+        client_kwargs["base_url"] = settings.openai_base_url
+
+    return OpenAI(**client_kwargs)
+
+
+@lru_cache(maxsize=1)
+def _get_async_client() -> AsyncOpenAI:
+    import httpx
+    from openai import AsyncOpenAI
+
+    settings = get_settings()
+    if not settings.openai_api_key:
+        raise EmbeddingError(
+            "OPENAI_API_KEY environment variable is required to create embeddings."
+        )
+
+    client_kwargs = {
+        "api_key": settings.openai_api_key,
+        "http_client": httpx.AsyncClient(**_http_options()),
+        "max_retries": 0,
+    }
+
+    if settings.openai_base_url:
+        client_kwargs["base_url"] = settings.openai_base_url
+
+    return AsyncOpenAI(**client_kwargs)
+
+
+def _backoff_delay(attempt: int, exc: Exception) -> float:
+    """Honor the server's Retry-After, else exponential backoff with full jitter."""
+    response = getattr(exc, "response", None)
+    if response is not None:
+        for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+            try:
+                return min(float(response.headers[header]) * scale, _MAX_BACKOFF)
+            except (KeyError, ValueError):  # absent, or the HTTP-date form
+                continue
+    # Full jitter keeps callers throttled together from retrying in lockstep.
+    ceiling = min(get_settings().embedding_retry_backoff * (2**attempt), _MAX_BACKOFF)
+    return random.uniform(0, ceiling)
+
+
+class OpenAIBackend(EmbeddingBackend):
+    def __init__(self) -> None:
+        # Async callers are capped by the embedding dispatcher; this covers
+        # synchronous callers running on several threads.
+        self._slots = threading.BoundedSemaphore(get_settings().embedding_max_concurrency)
+
+    def warm_up(self) -> None:
+        _retryable_errors()
+        _get_async_client()
+
+    def _extract(self, response, texts: List[str]) -> List[List[float]]:
+        if len(response.data) != len(texts):
+            raise _CountMismatchError(
+                f"OpenAI returned {len(response.data)} embeddings for {len(texts)} inputs."
+            )
+        metrics.increment("embedding_requests_total")
+        if response.usage is not None:
+            metrics.increment("embedding_tokens_total", response.usage.total_tokens)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        settings = get_settings()
+        client = _get_client()
+
+        attempt = 0
+        while True:
+            try:
+                with self._slots:
+                    response = client.embeddings.create(model=settings.embedding_model, input=texts)
+                return self._extract(response, texts)
+            except _retryable_errors() as exc:
+                if attempt >= settings.embedding_max_retries:
+                    raise EmbeddingError(f"Failed to create embedding via OpenAI: {exc}") from exc
+                time.sleep(_backoff_delay(attempt, exc))
+                attempt += 1
+            except EmbeddingError:
+                raise
+            except Exception as exc:  # pragma: no cover - API errors
+                raise EmbeddingError(f"Failed to create embedding via OpenAI: {exc}") from exc
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        settings = get_settings()
+        client = _get_async_client()
+
+        attempt = 0
+        while True:
+            try:
+                response = await client.embeddings.create(
+                    model=settings.embedding_model, input=texts
+                )
+                return self._extract(response, texts)
+            except _retryable_errors() as exc:
+                if attempt >= settings.embedding_max_retries:
+                    raise EmbeddingError(f"Failed to create embedding via OpenAI: {exc}") from exc
+                await asyncio.sleep(_backoff_delay(attempt, exc))
+                attempt += 1
+            except EmbeddingError:
+                raise
+            except Exception as exc:  # pragma: no cover - API errors
+                raise EmbeddingError(f"Failed to create embedding via OpenAI: {exc}") from exc
+
+    async def aclose(self) -> None:
+        if _get_async_client.cache_info().currsize:
+            await _get_async_client().close()
+            _get_async_client.cache_clear()
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Local CPU model via sentence-transformers (PyTorch or ONNX runtime).
+
+    Encoding runs on a dedicated thread pool so async callers never block the
+    event loop and concurrent requests share a bounded number of workers.
+    """
+
+    def __init__(self) -> None:
+        settings = get_settings()
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise EmbeddingError(
+                "EMBEDDING_BACKEND=local requires the optional 'sentence-transformers' "
+                "package (plus 'optimum[onnxruntime]' for LOCAL_EMBEDDING_RUNTIME=onnx)."
+            ) from exc
+
+        model_kwargs = {"device": settings.local_embedding_device}
+        if settings.local_embedding_runtime == "onnx":
+            model_kwargs["backend"] = "onnx"
+
+        try:
+            self._model = SentenceTransformer(settings.local_embedding_model, **model_kwargs)
+        except Exception as exc:  # pragma: no cover - model download/load errors
+            raise EmbeddingError(
+                f"Failed to load local embedding model '{settings.local_embedding_model}': {exc}"
+            ) from exc
+
+        native_dimension = self._model.get_sentence_embedding_dimension()
+        if native_dimension and native_dimension > settings.embedding_dimension:
+            raise EmbeddingError(
+                f"Local model produces {native_dimension}-dimensional vectors, more than "
+                f"EMBEDDING_DIMENSION={settings.embedding_dimension}."
+            )
+        # Zero-padding leaves cosine similarity unchanged, so smaller models can
+        # share the fixed-width VECTOR column.
+        native_dimension = native_dimension or settings.embedding_dimension
+        self._padding = settings.embedding_dimension - native_dimension
+        self._batch_size = settings.local_embedding_batch_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.local_embedding_threads,
+            thread_name_prefix="local-embed",
+        )
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._model.encode(
+            texts,
+            batch_size=self._batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=False,
+            show_progress_bar=False,
+        )
+        if self._padding:
+            vectors = np.pad(vectors, ((0, 0), (0, self._padding)))
+        return vectors.tolist()
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed, texts)
+
+    async def aclose(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+def _token_vector(token: str, dimension: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(token.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimension)
+
+
+def hash_embedding(text: str, dimension: int) -> List[float]:
+    """Deterministic bag-of-words embedding: texts sharing terms end up close."""
+    vector = np.zeros(dimension)
+    for token in text.lower().split() or ["empty"]:
+        vector += _token_vector(token, dimension)
+    norm = np.linalg.norm(vector)
+    return (vector / norm).tolist() if norm else vector.tolist()
+
+
+class HashBackend(EmbeddingBackend):
+    """Offline, deterministic embeddings for tests, demos and benchmarks."""
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        dimension = get_settings().embedding_dimension
+        return [hash_embedding(text, dimension) for text in texts]
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        return self.embed(texts)
+
+
+_BACKENDS = {
+    "openai": OpenAIBackend,
+    "local": SentenceTransformerBackend,
+    "hash": HashBackend,
+}
+
+
+@lru_cache(maxsize=1)
+def get_backend() -> EmbeddingBackend:
+    name = get_settings().embedding_backend
+    try:
+        backend_cls = _BACKENDS[name]
+    except KeyError as exc:
+        raise EmbeddingError(
+            f"Unknown EMBEDDING_BACKEND '{name}'; expected one of {sorted(_BACKENDS)}."
+        ) from exc
+    return backend_cls()
+
+
+async def close_backend() -> None:
+    if get_backend.cache_info().currsize:
+        await get_backend().aclose()
+        get_backend.cache_clear()
@@ -0,0 +1,214 @@
+"""Two-tier cache for embedding vectors keyed by model, dimension and text."""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from .cache import TTLCache
+from .db import get_async_connection, get_connection
+from .settings import get_settings
+
+_SELECT_SQL = "SELECT embedding FROM embedding_cache WHERE cache_key = %s;"
+_INSERT_SQL = """
+INSERT INTO embedding_cache (cache_key, embedding_model, dimension, embedding)
+VALUES (%s, %s, %s, %s)
+ON CONFLICT (cache_key) DO NOTHING;
+"""
+_persistent_hits = 0
+_persistent_errors = 0
+
+
+@lru_cache(maxsize=1)
+def _memory_cache() -> TTLCache[str, List[float]]:
+    settings = get_settings()
+    return TTLCache(settings.embedding_cache_size, settings.embedding_cache_ttl)
+
+
+def cache_key(text: str, *, model: Optional[str] = None, dimension: Optional[int] = None) -> str:
+    settings = get_settings()
+    model = model or settings.active_embedding_model
+    dimension = dimension or settings.embedding_dimension
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{dimension}:{digest}"
+
+
+def pack_vector(vector: List[float]) -> bytes:
+    return struct.pack(f"<{len(vector)}f", *vector)
+
+
+def unpack_vector(payload: bytes) -> List[float]:
+    return list(struct.unpack(f"<{len(payload) // 4}f", payload))
+
+
+def _load_persistent(key: str) -> Optional[List[float]]:
+    global _persistent_errors
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(_SELECT_SQL, (key,))
+            row = cur.fetchone()
+    except Exception:  # pragma: no cover - the cache must never break embedding
+        _persistent_errors += 1
+        return None
+
+    return unpack_vector(bytes(row[0])) if row else None
+
+
+def _store_persistent(key: str, vector: List[float]) -> None:
+    global _persistent_errors
+    settings = get_settings()
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                _INSERT_SQL,
+                (key, settings.active_embedding_model, len(vector), pack_vector(vector)),
+            )
+    except Exception:  # pragma: no cover - the cache must never break embedding
+        _persistent_errors += 1
+
+
+def get(text: str) -> Optional[List[float]]:
+    """Return the cached unit vector for already-normalized ``text``, if any."""
+    global _persistent_hits
+    key = cache_key(text)
+    memory = _memory_cache()
+
+    vector = memory.get(key)
+    if vector is not None:
+        return vector
+
+    if not get_settings().embedding_cache_persistent:
+        return None
+
+    vector = _load_persistent(key)
+    if vector is not None:
+        _persistent_hits += 1
+        memory.set(key, vector)
+    return vector
+
+
+def put(text: str, vector: List[float]) -> None:
+    key = cache_key(text)
+    _memory_cache().set(key, vector)
+    if get_settings().embedding_cache_persistent:
+        _store_persistent(key, vector)
+
+
+async def get_async(text: str) -> Optional[List[float]]:
+    global _persistent_hits, _persistent_errors
+    key = cache_key(text)
+    memory = _memory_cache()
+
+    vector = memory.get(key)
+    if vector is not None or not get_settings().embedding_cache_persistent:
+        return vector
+
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(_SELECT_SQL, (key,))
+            row = await cur.fetchone()
+    except Exception:  # pragma: no cover - the cache must never break embedding
+        _persistent_errors += 1
+        return None
+
+    if not row:
+        return None
+
+    vector = unpack_vector(bytes(row[0]))
+    _persistent_hits += 1
+    memory.set(key, vector)
+    return vector
+
+
+async def put_async(text: str, vector: List[float]) -> None:
+    global _persistent_errors
+    settings = get_settings()
+    key = cache_key(text)
+    _memory_cache().set(key, vector)
+    if not settings.embedding_cache_persistent:
+        return
+
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(
+                _INSERT_SQL,
+                (key, settings.active_embedding_model, len(vector), pack_vector(vector)),
+            )
+    except Exception:  # pragma: no cover - the cache must never break embedding
+        _persistent_errors += 1
+
+
+def get_many(texts: Iterable[str]) -> Dict[str, List[float]]:
+    """Bulk variant of :func:`get` that resolves persistent misses in one query."""
+    global _persistent_hits, _persistent_errors
+    memory = _memory_cache()
+    found: Dict[str, List[float]] = {}
+    missing: Dict[str, str] = {}
+    for text in texts:
+        key = cache_key(text)
+        vector = memory.get(key)
+        if vector is None:
+            missing[key] = text
+        else:
+            found[text] = vector
+
+    if not missing or not get_settings().embedding_cache_persistent:
+        return found
+
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT cache_key, embedding FROM embedding_cache WHERE cache_key = ANY(%s);",
+                (list(missing),),
+            )
+            rows = cur.fetchall()
+    except Exception:  # pragma: no cover - the cache must never break embedding
+        _persistent_errors += 1
+        return found
+
+    for key, payload in rows:
+        vector = unpack_vector(bytes(payload))
+        memory.set(key, vector)
+        found[missing[key]] = vector
+    _persistent_hits += len(rows)
+    return found
+
+
+def put_many(vectors: Dict[str, List[float]]) -> None:
+    global _persistent_errors
+    if not vectors:
+        return
+
+    settings = get_settings()
+    memory = _memory_cache()
+    params = []
+    for text, vector in vectors.items():
+        key = cache_key(text)
+        memory.set(key, vector)
+        params.append((key, settings.active_embedding_model, len(vector), pack_vector(vector)))
+
+    if not settings.embedding_cache_persistent:
+        return
+
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.executemany(_INSERT_SQL, params)
+    except Exception:  # pragma: no cover - the cache must never break embedding
+        _persistent_errors += 1
+
+
+def clear_memory() -> None:
+    _memory_cache().clear()
+
+
+def stats() -> dict[str, int]:
+    memory = _memory_cache().stats()
+    return {
+        "memory_hits": memory["hits"],
+        "persistent_hits": _persistent_hits,
+        "misses": memory["misses"] - _persistent_hits,
+        "memory_size": memory["size"],
+        "persistent_errors": _persistent_errors,
+    }
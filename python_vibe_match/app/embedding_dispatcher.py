@@ -0,0 +1,121 @@
+"""Coalescing, micro-batching front end for async embedding requests.
+
+Concurrent callers asking for the same text share one in-flight future
+(single flight). Distinct texts arriving within ``EMBEDDING_BATCH_WINDOW``
+seconds are sent as one multi-input request, and at most
+``EMBEDDING_MAX_CONCURRENCY`` requests are outstanding at a time, so a burst
+of searches turns into a few well-formed API calls instead of one per user.
+When a multi-input request fails because of its inputs (typically one
+unacceptable text), its texts are re-sent one by one so each caller only sees
+its own failure; outages and configuration errors fail every caller at once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from . import metrics
+
+BatchRequest = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def _never_input_error(exc: BaseException) -> bool:
+    return False
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Avoid "exception was never retrieved" when every waiter was cancelled.
+    if not future.cancelled():
+        future.exception()
+
+
+class EmbeddingDispatcher:
+    """Bound to the event loop it was created on."""
+
+    def __init__(
+        self,
+        request_batch: BatchRequest,
+        *,
+        window: float,
+        max_batch: int,
+        max_concurrency: int,
+        input_error: Callable[[BaseException], bool] = _never_input_error,
+    ) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._request_batch = request_batch
+        self._input_error = input_error
+        self._window = window
+        self._max_batch = max(1, max_batch)
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """Raw embedding of ``text``, shared with any identical concurrent request."""
+        future = self._inflight.get(text)
+        if future is None:
+            future = self.loop.create_future()
+            future.add_done_callback(_consume_exception)
+            self._inflight[text] = future
+            self._pending.append(text)
+            if len(self._pending) >= self._max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = self.loop.call_later(self._window, self._flush)
+        else:
+            metrics.increment("embedding_coalesced_total")
+        # Shielded so one caller timing out does not cancel the shared request.
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self.loop.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _request(self, texts: List[str]) -> List[List[float]]:
+        async with self._slots:
+            return await self._request_batch(texts)
+
+    async def _request_one(self, text: str) -> List[float]:
+        return (await self._request([text]))[0]
+
+    async def _send(self, batch: List[str]) -> None:
+        futures = [self._inflight[text] for text in batch]
+        try:
+            try:
+                results = await self._request(batch)
+            except Exception as exc:
+                # Only a failure caused by the inputs can differ per text;
+                # retry those one by one to isolate the text that caused it.
+                if len(batch) == 1 or not self._input_error(exc):
+                    raise
+                results = await asyncio.gather(
+                    *(self._request_one(text) for text in batch), return_exceptions=True
+                )
+        except Exception as exc:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for future, result in zip(futures, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                elif not isinstance(result, BaseException):
+                    future.set_result(result)
+        finally:
+            for text, future in zip(batch, futures):
+                if not future.done():
+                    future.cancel()
+                if self._inflight.get(text) is future:
+                    del self._inflight[text]
@@ -1,34 +1,90 @@
 from __future__ import annotations
 
+import asyncio
 import math
-from functools import lru_cache
+from typing import Iterator, List, Optional, Sequence
 
-import httpx
-from openai import OpenAI
 from pgvector.psycopg import to_db
 
+from . import embedding_cache
+from .embedding_backends import get_backend, is_input_error
+from .embedding_dispatcher import EmbeddingDispatcher
 from .errors import EmbeddingError, NormalizationError
+from .metrics import timed
 from .settings import get_settings
-from .text_normalization import normalize_text
+from .text_normalization import normalize_text, normalize_texts
 
+# Hard limit of the embeddings endpoint on inputs per request.
+_MAX_INPUTS_PER_REQUEST = 2048
 
-@lru_cache(maxsize=1)
-def _get_client() -> OpenAI:
+_DISPATCHER: Optional[EmbeddingDispatcher] = None
+
+
+def _estimate_tokens(text: str) -> int:
+    # Roughly three characters per token errs on the side of smaller batches.
+    return len(text) // 3 + 1
+
+
+def _chunk_inputs(texts: Sequence[str]) -> Iterator[List[str]]:
     settings = get_settings()
-    if not settings.openai_api_key:
-        raise EmbeddingError(
-            "OPENAI_API_KEY environment variable is required to create embeddings."
+    max_inputs = max(1, min(settings.embedding_batch_size, _MAX_INPUTS_PER_REQUEST))
+    max_tokens = settings.embedding_batch_max_tokens
+
+    batch: List[str] = []
+    batch_tokens = 0
+    for text in texts:
+        tokens = _estimate_tokens(text)
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+
+    if batch:
+        yield batch
+
+
+def _checked(embeddings: List[List[float]]) -> List[List[float]]:
+    dimension = get_settings().embedding_dimension
+    for embedding in embeddings:
+        if len(embedding) != dimension:
+            raise EmbeddingError(
+                f"Embedding dimension mismatch: expected {dimension}, "
+                f"received {len(embedding)}."
+            )
+    return embeddings
+
+
+@timed("embed")
+def _request_embeddings(texts: List[str]) -> List[List[float]]:
+    return _checked(get_backend().embed(texts))
+
+
+async def _request_embeddings_async(texts: List[str]) -> List[List[float]]:
+    return _checked(await get_backend().embed_async(texts))
+
+
+def _get_dispatcher() -> EmbeddingDispatcher:
+    """Return the dispatcher for the running event loop, creating it on first use."""
+    global _DISPATCHER
+    if _DISPATCHER is None or _DISPATCHER.loop is not asyncio.get_running_loop():
+        settings = get_settings()
+        _DISPATCHER = EmbeddingDispatcher(
+            _request_embeddings_async,
+            window=settings.embedding_batch_window,
+            max_batch=min(settings.embedding_batch_size, _MAX_INPUTS_PER_REQUEST),
+            max_concurrency=settings.embedding_max_concurrency,
+            input_error=is_input_error,
         )
+    return _DISPATCHER
 
-    client_kwargs = {
-        "api_key": settings.openai_api_key,
-        "http_client": httpx.Client(trust_env=False),
-    }
 
-    if settings.openai_base_url:
-        client_kwargs["base_url"] = settings.openai_base_url
+def _unit_normalize(embedding: List[float]) -> List[float]:
+    norm = math.sqrt(sum(component * component for component in embedding))
+    if norm == 0:
+        raise EmbeddingError("Embedding norm evaluated to zero; cannot normalize.")
 
-    return OpenAI(**client_kwargs)
+    return [component / norm for component in embedding]
 
 
 def embed_text(text: str, *, already_normalized: bool = False) -> list[float]:
@@ -38,26 +94,60 @@ def embed_text(text: str, *, already_normalized: bool = False) -> list[float]:
         raise EmbeddingError(str(exc)) from exc
 
     settings = get_settings()
-    client = _get_client()
+    vector = embedding_cache.get(normalized)
+    if vector is None:
+        vector = _unit_normalize(_request_embeddings([normalized])[0])
+        embedding_cache.put(normalized, vector)
+
+    return to_db(vector, settings.embedding_dimension)
+
 
+async def embed_vector_async(text: str, *, already_normalized: bool = False) -> List[float]:
+    """Unit-normalized embedding of ``text`` as floats, for in-process search."""
     try:
-        response = client.embeddings.create(model=settings.embedding_model, input=normalized)
-    except Exception as exc:  # pragma: no cover - API errors
-        raise EmbeddingError(f"Failed to create embedding via OpenAI: {exc}") from exc
-
-    if not response.data:
-        raise EmbeddingError("OpenAI returned no embedding data.")
-
-    embedding = response.data[0].embedding
-    if len(embedding) != settings.embedding_dimension:
-        raise EmbeddingError(
-            f"Embedding dimension mismatch: expected {settings.embedding_dimension}, "
-            f"received {len(embedding)}."
-        )
+        normalized = text if already_normalized else await asyncio.to_thread(normalize_text, text)
+    except NormalizationError as exc:
+        raise EmbeddingError(str(exc)) from exc
+
+    vector = await embedding_cache.get_async(normalized)
+    if vector is None:
+        # Timed around the await rather than inside the dispatcher: its batch
+        # task only carries the context of the request that opened the batch,
+        # so every other caller's Server-Timing would miss the embed stage.
+        with timed("embed"):
+            raw = await _get_dispatcher().embed(normalized)
+        vector = _unit_normalize(raw)
+        await embedding_cache.put_async(normalized, vector)
+    return vector
+
+
+async def embed_text_async(text: str, *, already_normalized: bool = False) -> list[float]:
+    """Event-loop friendly :func:`embed_text`; spaCy work runs in a worker thread."""
+    vector = await embed_vector_async(text, already_normalized=already_normalized)
+    return to_db(vector, get_settings().embedding_dimension)
 
-    norm = math.sqrt(sum(component * component for component in embedding))
-    if norm == 0:
-        raise EmbeddingError("Embedding norm evaluated to zero; cannot normalize.")
 
-    normalized = [component / norm for component in embedding]
-    return to_db(normalized, settings.embedding_dimension)
+def embed_texts(texts: Sequence[str], *, already_normalized: bool = False) -> list[list[float]]:
+    """Embed many texts, sending cache misses in chunked multi-input requests.
+
+    Results are returned in input order; duplicate texts are embedded once.
+    """
+    try:
+        normalized = list(texts) if already_normalized else normalize_texts(texts)
+    except NormalizationError as exc:
+        raise EmbeddingError(str(exc)) from exc
+
+    settings = get_settings()
+    unique = list(dict.fromkeys(normalized))
+    vectors = embedding_cache.get_many(unique)
+    pending = [text for text in unique if text not in vectors]
+
+    for batch in _chunk_inputs(pending):
+        fresh = {
+            text: _unit_normalize(embedding)
+            for text, embedding in zip(batch, _request_embeddings(batch))
+        }
+        embedding_cache.put_many(fresh)
+        vectors.update(fresh)
+
+    return [to_db(vectors[text], settings.embedding_dimension) for text in normalized]
@@ -0,0 +1,83 @@
+"""Streaming export of stored vibes to JSONL or Parquet in constant memory."""
+
+from __future__ import annotations
+
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+from .vibes import Vibe, iter_vibes
+
+EXPORT_FORMATS = ("jsonl", "parquet")
+
+
+def _batches(records: Iterator[Vibe], size: int) -> Iterator[List[Vibe]]:
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def _write_jsonl(path: Path, records: Iterator[Vibe], batch_size: int, progress) -> int:
+    written = 0
+    with path.open("w", encoding="utf-8") as handle:
+        for batch in _batches(records, batch_size):
+            handle.writelines(
+                json.dumps(record.to_dict(), ensure_ascii=False) + "\n" for record in batch
+            )
+            written += len(batch)
+            if progress:
+                progress(written)
+    return written
+
+
+def _write_parquet(
+    path: Path, records: Iterator[Vibe], batch_size: int, include_embeddings: bool, progress
+) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ValueError("Parquet export requires the optional 'pyarrow' package.") from exc
+
+    fields = [
+        pa.field("uid", pa.string()),
+        pa.field("original_vibe", pa.string()),
+        pa.field("processed_vibe", pa.string()),
+        pa.field("embedding_model", pa.string()),
+        pa.field("created_at", pa.string()),
+        pa.field("updated_at", pa.string()),
+    ]
+    if include_embeddings:
+        fields.append(pa.field("embedding", pa.list_(pa.float32())))
+    schema = pa.schema(fields)
+
+    written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in _batches(records, batch_size):
+            columns = {field.name: [getattr(record, field.name) for record in batch] for field in schema}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            written += len(batch)
+            if progress:
+                progress(written)
+    return written
+
+
+def export_vibes(
+    path: Path,
+    *,
+    fmt: str = "jsonl",
+    include_embeddings: bool = False,
+    batch_size: int = 1000,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Write every vibe to ``path``; returns the number of rows exported."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; expected one of {EXPORT_FORMATS}.")
+
+    records = iter_vibes(include_embeddings=include_embeddings, batch_size=batch_size)
+    try:
+        if fmt == "parquet":
+            return _write_parquet(path, records, batch_size, include_embeddings, progress)
+        return _write_jsonl(path, records, batch_size, progress)
+    finally:
+        records.close()
@@ -0,0 +1,228 @@
+"""Selection, sizing and (re)building of the ANN index on ``vibes.embedding``."""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from psycopg import sql
+
+from .db import get_connection
+from .errors import DatabaseError
+from .settings import DEFAULT_HNSW_EF_SEARCH, get_settings
+
+INDEX_NAME = "vibes_embedding_idx"
+STRATEGIES = ("hnsw", "ivfflat", "exact")
+
+_SAVE_CONFIG_SQL = """
+INSERT INTO vibes_index_config (id, strategy, lists, probes, m, ef_construction, ef_search, row_count)
+VALUES (TRUE, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT (id) DO UPDATE
+SET strategy = EXCLUDED.strategy,
+    lists = EXCLUDED.lists,
+    probes = EXCLUDED.probes,
+    m = EXCLUDED.m,
+    ef_construction = EXCLUDED.ef_construction,
+    ef_search = EXCLUDED.ef_search,
+    row_count = EXCLUDED.row_count,
+    built_at = NOW();
+"""
+_LOAD_CONFIG_SQL = """
+SELECT strategy, lists, probes, m, ef_construction, ef_search, row_count
+FROM vibes_index_config;
+"""
+
+
+@dataclass
+class IndexPlan:
+    strategy: str
+    row_count: int
+    lists: Optional[int] = None
+    probes: Optional[int] = None
+    m: Optional[int] = None
+    ef_construction: Optional[int] = None
+    ef_search: Optional[int] = None
+
+    def describe(self) -> str:
+        if self.strategy == "ivfflat":
+            return f"ivfflat (lists={self.lists}, probes={self.probes}) over {self.row_count} rows"
+        if self.strategy == "hnsw":
+            return (
+                f"hnsw (m={self.m}, ef_construction={self.ef_construction}, "
+                f"ef_search={self.ef_search}) over {self.row_count} rows"
+            )
+        return f"exact scan over {self.row_count} rows"
+
+
+def ivfflat_lists_for(row_count: int) -> int:
+    """pgvector's sizing guidance: rows/1000 up to 1M rows, sqrt(rows) beyond."""
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def ivfflat_probes_for(lists: int, target_recall: float) -> int:
+    """Heuristic probe count for a recall target.
+
+    ``sqrt(lists)`` gives roughly 0.9 recall on typical data; each extra point
+    of recall above that scales the probe count up. Use the ``bench`` command
+    to confirm the achieved recall on real data.
+    """
+    boost = 1.0 + 10.0 * max(target_recall - 0.9, 0.0)
+    return max(1, min(lists, math.ceil(math.sqrt(lists) * boost)))
+
+
+def count_vibes() -> int:
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM vibes;")
+            return int(cur.fetchone()[0])
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to count vibes: {exc}") from exc
+
+
+def plan_index(
+    strategy: Optional[str] = None,
+    *,
+    row_count: Optional[int] = None,
+    lists: Optional[int] = None,
+    probes: Optional[int] = None,
+    target_recall: Optional[float] = None,
+    m: Optional[int] = None,
+    ef_construction: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> IndexPlan:
+    settings = get_settings()
+    row_count = count_vibes() if row_count is None else row_count
+    strategy = strategy or settings.vector_index
+    if strategy == "auto":
+        strategy = "exact" if row_count < settings.exact_scan_max_rows else "hnsw"
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown index strategy '{strategy}'; expected one of {STRATEGIES}.")
+
+    if strategy == "ivfflat":
+        lists = lists or settings.ivfflat_lists or ivfflat_lists_for(row_count)
+        recall = target_recall or settings.ivfflat_target_recall
+        return IndexPlan(
+            strategy,
+            row_count,
+            lists=lists,
+            probes=probes or ivfflat_probes_for(lists, recall),
+        )
+
+    if strategy == "hnsw":
+        return IndexPlan(
+            strategy,
+            row_count,
+            m=m or settings.hnsw_m,
+            ef_construction=ef_construction or settings.hnsw_ef_construction,
+            ef_search=ef_search or settings.hnsw_ef_search or DEFAULT_HNSW_EF_SEARCH,
+        )
+
+    return IndexPlan(strategy, row_count)
+
+
+def create_index_sql(
+    plan: IndexPlan,
+    name: str,
+    *,
+    concurrently: bool,
+    table: str = "vibes",
+    column: str = "embedding",
+    opclass: str = "vector_cosine_ops",
+) -> sql.Composed:
+    if plan.strategy == "ivfflat":
+        method = sql.SQL("ivfflat")
+        options = sql.SQL("lists = {}").format(sql.Literal(plan.lists))
+    else:
+        method = sql.SQL("hnsw")
+        options = sql.SQL("m = {}, ef_construction = {}").format(
+            sql.Literal(plan.m), sql.Literal(plan.ef_construction)
+        )
+
+    return sql.SQL(
+        "CREATE INDEX {concurrently} {name} ON {table} USING {method} "
+        "({column} {opclass}) WITH ({options});"
+    ).format(
+        concurrently=sql.SQL("CONCURRENTLY" if concurrently else ""),
+        name=sql.Identifier(name),
+        table=sql.Identifier(table),
+        column=sql.Identifier(column),
+        opclass=sql.SQL(opclass),
+        method=method,
+        options=options,
+    )
+
+
+def build_index(plan: IndexPlan, *, concurrently: bool = True) -> None:
+    """Replace ``vibes_embedding_idx`` according to ``plan``.
+
+    With ``concurrently`` the new index is built next to the old one, then
+    one short transaction renames the old index aside, renames the new one
+    into place and drops the old one, so there is no moment without an ANN
+    index and writes are only blocked for the swap itself.
+    """
+    drop = sql.SQL("DROP INDEX {concurrently} IF EXISTS {name};")
+    rename = sql.SQL("ALTER INDEX IF EXISTS {} RENAME TO {};")
+    concurrently_sql = sql.SQL("CONCURRENTLY" if concurrently else "")
+    staging_name = f"{INDEX_NAME}_new"
+    retired_name = f"{INDEX_NAME}_old"
+
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                for name in (staging_name, retired_name):
+                    cur.execute(
+                        drop.format(concurrently=concurrently_sql, name=sql.Identifier(name))
+                    )
+                if plan.strategy == "exact":
+                    cur.execute(
+                        drop.format(concurrently=concurrently_sql, name=sql.Identifier(INDEX_NAME))
+                    )
+                else:
+                    cur.execute(create_index_sql(plan, staging_name, concurrently=concurrently))
+
+            with conn.transaction(), conn.cursor() as cur:
+                if plan.strategy != "exact":
+                    cur.execute(
+                        rename.format(sql.Identifier(INDEX_NAME), sql.Identifier(retired_name))
+                    )
+                    cur.execute(
+                        rename.format(sql.Identifier(staging_name), sql.Identifier(INDEX_NAME))
+                    )
+                    cur.execute(
+                        drop.format(concurrently=sql.SQL(""), name=sql.Identifier(retired_name))
+                    )
+                cur.execute(
+                    _SAVE_CONFIG_SQL,
+                    (
+                        plan.strategy,
+                        plan.lists,
+                        plan.probes,
+                        plan.m,
+                        plan.ef_construction,
+                        plan.ef_search,
+                        plan.row_count,
+                    ),
+                )
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to build vector index: {exc}") from exc
+
+
+def load_index_plan() -> Optional[IndexPlan]:
+    """Return the plan recorded by the last ``build_index`` call, if any."""
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('vibes_index_config');")
+            if cur.fetchone()[0] is None:
+                return None
+            cur.execute(_LOAD_CONFIG_SQL)
+            row = cur.fetchone()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to load index config: {exc}") from exc
+
+    if not row:
+        return None
+    strategy, lists, probes, m, ef_construction, ef_search, row_count = row
+    return IndexPlan(strategy, row_count, lists, probes, m, ef_construction, ef_search)
@@ -1,29 +1,153 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
 from urllib.parse import urlencode
 
-from fastapi import FastAPI, Form, Request
+from fastapi import FastAPI, Form, Query, Request
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from . import vibes
-from .errors import DatabaseError, EmbeddingError
+from . import async_vibes, db, embedding_backends, embedding_cache, metrics, migrations, vibes
+from .errors import DatabaseError, EmbeddingError, NormalizationError
+from .replica import get_replica
+from .settings import get_settings
+from .text_normalization import normalize_text
 
-app = FastAPI(title="42Quackform Vibes")
+
+logger = logging.getLogger(__name__)
+
+
+async def _check_schema() -> None:
+    """Warn at startup when ``manage_vibes.py migrate`` has not been run."""
+    try:
+        current = await migrations.current_version_async()
+    except DatabaseError as exc:
+        logger.warning("Could not check the schema version: %s", exc)
+        return
+
+    latest = migrations.latest_version()
+    if current < latest:
+        logger.warning(
+            "Database schema is at version %s but this release expects %s; "
+            "run `python scripts/manage_vibes.py migrate`.",
+            current,
+            latest,
+        )
+
+
+async def _warm_up() -> None:
+    """Load spaCy, the embedding client and the sync pool before the first request needs them."""
+    # The persistent embedding cache and the vector replica use the sync pool.
+    try:
+        await asyncio.to_thread(db.get_pool)
+    except DatabaseError as exc:
+        logger.warning("Could not open the database pool: %s", exc)
+
+    try:
+        await asyncio.to_thread(normalize_text, "warm up")
+    except NormalizationError as exc:
+        logger.warning("Could not load the normalization pipeline: %s", exc)
+
+    try:
+        backend = await asyncio.to_thread(embedding_backends.get_backend)
+        await asyncio.to_thread(backend.warm_up)
+    except EmbeddingError as exc:
+        logger.warning("Could not prepare the embedding backend: %s", exc)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # The schema check also opens the async pool and its first connection.
+    await _check_schema()
+    if get_settings().startup_warmup:
+        await _warm_up()
+    replica = get_replica()
+    poller = asyncio.create_task(replica.poll_forever()) if replica else None
+    yield
+    if poller:
+        poller.cancel()
+        await run_in_threadpool(replica.save_snapshot)
+    await run_in_threadpool(db.close_pools)
+    await db.close_async_pool()
+    await embedding_backends.close_backend()
+
+
+app = FastAPI(title="42Quackform Vibes", lifespan=lifespan)
 
 templates = Jinja2Templates(directory="app/templates")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    timings = metrics.start_request()
+    started = time.perf_counter()
+    response = await call_next(request)
+    if timings is not None:
+        metrics.observe("request", time.perf_counter() - started)
+        if timings:
+            response.headers["Server-Timing"] = metrics.server_timing(timings)
+    return response
+
+
 async def _load_vibes(limit: int = 20):
     try:
-        return await run_in_threadpool(vibes.list_vibes, limit)
+        return await async_vibes.list_recent_vibes(limit)
     except DatabaseError as exc:
         raise exc
 
 
+@app.get("/health")
+async def health():
+    database_ok = await db.check_database_async()
+    payload = {
+        "status": "ok" if database_ok else "degraded",
+        "database": database_ok,
+        "pools": db.pool_stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "upserts": vibes.upsert_stats(),
+    }
+    replica = get_replica()
+    if replica is not None:
+        payload["replica"] = {"rows": len(replica), "fresh": replica.fresh()}
+    if database_ok:
+        try:
+            payload["schema"] = {
+                "version": await migrations.current_version_async(),
+                "latest": migrations.latest_version(),
+            }
+        except DatabaseError:
+            payload["schema"] = None
+    return JSONResponse(payload, status_code=200 if database_ok else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    cache_stats = embedding_cache.stats()
+    gauges = {"embedding_cache_memory_size": cache_stats.pop("memory_size")}
+    for pool, stats in db.pool_stats().items():
+        gauges.update({f"db_pool_{pool}_{name}": value for name, value in stats.items()})
+    # Hit/miss/error and upsert tallies only grow, so they are exported as counters.
+    counters = {f"embedding_cache_{name}_total": value for name, value in cache_stats.items()}
+    counters.update(
+        {f"upserts_{name}_total": value for name, value in vibes.upsert_stats().items()}
+    )
+    return PlainTextResponse(
+        metrics.render_prometheus(gauges, counters), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request, message: str | None = None, error: str | None = None):
     try:
@@ -40,13 +164,14 @@ async def index(request: Request, message: str | None = None, error: str | None
         "message": message,
         "error": error,
     }
-    return templates.TemplateResponse("index.html", context)
+    with metrics.timed("render"):
+        return templates.TemplateResponse("index.html", context)
 
 
 @app.post("/vibes")
 async def create_vibe(uid: str = Form(...), vibe_text: str = Form(...)):
     try:
-        await run_in_threadpool(vibes.upsert_vibe, uid, vibe_text)
+        written = await async_vibes.upsert_vibe(uid, vibe_text)
     except EmbeddingError as exc:
         params = urlencode({"error": str(exc)})
         return RedirectResponse(url=f"/?{params}", status_code=303)
@@ -54,7 +179,8 @@ async def create_vibe(uid: str = Form(...), vibe_text: str = Form(...)):
         params = urlencode({"error": str(exc)})
         return RedirectResponse(url=f"/?{params}", status_code=303)
 
-    params = urlencode({"message": f"Saved vibe for {uid}."})
+    message = f"Saved vibe for {uid}." if written else f"Vibe for {uid} is unchanged."
+    params = urlencode({"message": message})
     return RedirectResponse(url=f"/?{params}", status_code=303)
 
 
@@ -64,18 +190,28 @@ async def search_vibes(request: Request, query: str = Form(...), top_k: int = Fo
     error: str | None = None
     results = []
 
-    try:
-        results = await run_in_threadpool(vibes.search_vibes, query, top_k)
-    except EmbeddingError as exc:
-        error = str(exc)
-    except DatabaseError as exc:
-        error = str(exc)
+    # The query embedding/ANN lookup and the sidebar listing are independent,
+    # so the page waits for the slower of the two rather than their sum.
+    searched, listed = await asyncio.gather(
+        async_vibes.search_vibes(query, top_k),
+        _load_vibes(),
+        return_exceptions=True,
+    )
 
-    try:
-        existing = await _load_vibes()
-    except DatabaseError as exc:
-        error = error or str(exc)
+    if isinstance(searched, (EmbeddingError, DatabaseError)):
+        error = str(searched)
+    elif isinstance(searched, BaseException):
+        raise searched
+    else:
+        results = searched
+
+    if isinstance(listed, DatabaseError):
+        error = error or str(listed)
         existing = []
+    elif isinstance(listed, BaseException):
+        raise listed
+    else:
+        existing = listed
 
     context = {
         "request": request,
@@ -85,4 +221,87 @@ async def search_vibes(request: Request, query: str = Form(...), top_k: int = Fo
         "message": message,
         "error": error,
     }
-    return templates.TemplateResponse("index.html", context)
+    with metrics.timed("render"):
+        return templates.TemplateResponse("index.html", context)
+
+
+@app.get("/api/vibes")
+async def api_list_vibes(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None),
+):
+    """Keyset-paginated vibes, most recently updated first."""
+    try:
+        page = await async_vibes.list_vibes_page(limit, cursor)
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    except DatabaseError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=503)
+
+    return {
+        "items": [record.to_dict() for record in page.items],
+        "next_cursor": page.next_cursor,
+    }
+
+
+@app.get("/api/vibes/{uid}/similar")
+async def api_similar_vibes(uid: str, top_k: int = Query(5, ge=1, le=50)):
+    """Vibes closest to the one stored for ``uid``, using its stored embedding."""
+    try:
+        results = await async_vibes.find_similar(uid, top_k)
+    except DatabaseError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=503)
+
+    if results is None:
+        return JSONResponse({"error": f"No vibe found for uid '{uid}'."}, status_code=404)
+    return {"uid": uid, "top_k": top_k, "results": [result.to_dict() for result in results]}
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """RFC 9110 ``If-None-Match`` check: ``*`` or a list of (weakly compared) tags."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+@app.get("/api/search")
+async def api_search(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    top_k: int = Query(5, ge=1, le=50),
+):
+    """Compact JSON search results with ETag revalidation.
+
+    The ETag changes whenever any vibe is written or the index is rebuilt, so
+    a matching ``If-None-Match`` is answered with 304 before any embedding or
+    ANN work is done.
+    """
+    try:
+        fingerprint = await async_vibes.search_fingerprint(q, top_k)
+    except DatabaseError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=503)
+
+    headers = {
+        "ETag": f'"{fingerprint}"',
+        "Cache-Control": f"public, max-age={get_settings().search_cache_max_age}",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        results = await async_vibes.search_vibes_cached(q, top_k, fingerprint)
+    except EmbeddingError as exc:
+        # Only a query that cannot be normalized is the client's fault; anything
+        # else is the embedding backend failing upstream.
+        status_code = 400 if isinstance(exc.__cause__, NormalizationError) else 502
+        return JSONResponse({"error": str(exc)}, status_code=status_code)
+    except DatabaseError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=503)
+
+    payload = {"query": q, "top_k": top_k, "results": [result.to_dict() for result in results]}
+    return JSONResponse(payload, headers=headers)
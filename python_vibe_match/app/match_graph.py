@@ -0,0 +1,380 @@
+"""Precomputed top-k match graph for every stored vibe.
+
+All embeddings of the active model are loaded into one float32 matrix and
+candidates come from blocked matrix products (``block_size`` rows at a time,
+so memory stays at ``block_size x rows`` floats) spread over a thread pool;
+NumPy releases the GIL inside the products. Candidates are then scored with
+:func:`app.ranking.rerank` exactly like ``search_vibes``, using each source's
+own text as the query, and written to ``vibe_matches``.
+
+Incremental refreshes only recompute sources whose matches can have changed:
+changed rows, sources matching changed or deleted rows, and sources whose
+current ``top_k``-th score could be beaten by a changed row. A row counts as
+changed when it was edited since the last watermark or has no stored matches;
+the latter catches rows that joined the active model through ``reembed``,
+which keeps ``updated_at``. The score test compares the upper bound
+``w_sim * similarity + w_lexical + w_recency`` with the source's stored
+matches re-scored at the current time (stored scores include recency, which
+has decayed since), or with ``MIN_FINAL_SCORE`` for sources holding fewer
+than ``top_k`` matches, so it never misses a changed row.
+
+Recency decay can also reorder matches between unchanged rows, which no
+incremental run looks for, so a full refresh is forced once the last one is
+older than ``MATCH_GRAPH_FULL_REFRESH_DAYS``.
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .db import get_connection
+from .errors import DatabaseError
+from .ranking import MIN_FINAL_SCORE, RankWeights, rerank
+from .settings import get_settings
+
+# updated_at is the writer's transaction start, so a write committed after a
+# refresh can carry an older timestamp than the recorded watermark; rows this
+# close to the watermark are always treated as changed.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+_COUNT_SQL = "SELECT COUNT(*) FROM vibes WHERE embedding_model = %s;"
+_LOAD_SQL = """
+SELECT uid, original_vibe, vibe_terms, COALESCE(updated_at, created_at), embedding
+FROM vibes
+WHERE embedding_model = %s
+ORDER BY uid;
+"""
+_STATE_SQL = "SELECT watermark, embedding_model, top_k, full_refreshed_at FROM vibe_match_state;"
+_SAVE_STATE_SQL = """
+INSERT INTO vibe_match_state (id, watermark, embedding_model, top_k, full_refreshed_at)
+VALUES (TRUE, %(watermark)s, %(model)s, %(top_k)s, CASE WHEN %(full)s THEN NOW() END)
+ON CONFLICT (id) DO UPDATE
+SET watermark = EXCLUDED.watermark,
+    embedding_model = EXCLUDED.embedding_model,
+    top_k = EXCLUDED.top_k,
+    refreshed_at = NOW(),
+    full_refreshed_at = COALESCE(EXCLUDED.full_refreshed_at, vibe_match_state.full_refreshed_at);
+"""
+_CURRENT_MATCHES_SQL = "SELECT uid, match_uid, score FROM vibe_matches;"
+_DELETE_SOURCES_SQL = "DELETE FROM vibe_matches WHERE uid = ANY(%s);"
+_DELETE_ORPHANS_SQL = """
+DELETE FROM vibe_matches m
+WHERE NOT EXISTS (
+    SELECT 1 FROM vibes v WHERE v.uid = m.uid AND v.embedding_model = %s
+);
+"""
+_COPY_SQL = "COPY vibe_matches (uid, rank, match_uid, score, distance) FROM STDIN"
+
+
+@dataclass
+class _Snapshot:
+    uids: List[str]
+    texts: List[str]
+    terms: List[List[str]]
+    timestamps: List[Optional[datetime]]
+    matrix: np.ndarray
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        stamps = [stamp for stamp in self.timestamps if stamp is not None]
+        return max(stamps) if stamps else None
+
+
+@dataclass
+class MatchGraphResult:
+    sources: int
+    refreshed: int
+    full: bool
+    seconds: float
+
+
+def _load_snapshot(cur, model: str) -> _Snapshot:
+    cur.execute(_COUNT_SQL, (model,))
+    count = int(cur.fetchone()[0])
+    matrix = np.zeros((count, get_settings().embedding_dimension), dtype=np.float32)
+    snapshot = _Snapshot([], [], [], [], matrix)
+
+    cur.execute(_LOAD_SQL, (model,))
+    for position, (uid, text, terms, stamp, embedding) in enumerate(cur):
+        if position >= count:  # rows inserted after the count are picked up next run
+            break
+        snapshot.uids.append(uid)
+        snapshot.texts.append(text)
+        snapshot.terms.append(terms)
+        snapshot.timestamps.append(stamp)
+        matrix[position] = embedding
+
+    snapshot.matrix = matrix[: len(snapshot.uids)]
+    norms = np.linalg.norm(snapshot.matrix, axis=1, keepdims=True)
+    np.divide(snapshot.matrix, norms, out=snapshot.matrix, where=norms > 0)
+    return snapshot
+
+
+def _blocks(rows: np.ndarray, block_size: int) -> List[np.ndarray]:
+    return [rows[start : start + block_size] for start in range(0, len(rows), block_size)]
+
+
+def _block_similarities(matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Cosine similarity of ``rows`` against every row, excluding each row itself."""
+    similarities = matrix[rows] @ matrix.T
+    similarities[np.arange(len(rows)), rows] = -np.inf
+    return similarities
+
+
+def _block_candidates(matrix: np.ndarray, rows: np.ndarray, pool: int) -> Tuple[np.ndarray, np.ndarray]:
+    similarities = _block_similarities(matrix, rows)
+    candidates = np.argpartition(-similarities, pool - 1, axis=1)[:, :pool]
+    return candidates, np.take_along_axis(similarities, candidates, axis=1)
+
+
+def _best_similarity(
+    matrix: np.ndarray, changed: np.ndarray, block_size: int, executor: ThreadPoolExecutor
+) -> np.ndarray:
+    """Highest similarity of every row to any ``changed`` row (other than itself)."""
+    best = np.full(len(matrix), -np.inf, dtype=np.float32)
+    for block_best in executor.map(
+        lambda rows: _block_similarities(matrix, rows).max(axis=0),
+        _blocks(changed, block_size),
+    ):
+        np.maximum(best, block_best, out=best)
+    return best
+
+
+def _changed_rows(
+    snapshot: _Snapshot,
+    since: Optional[datetime],
+    current: Dict[str, List[Tuple[str, float]]],
+) -> np.ndarray:
+    """Positions of rows written after ``since`` (every row when it is ``None``)
+    or without matches in ``current``.
+
+    Sources whose matches all fall below ``MIN_FINAL_SCORE`` store none either,
+    so they are recomputed on every run; that is rare and cheap.
+    """
+    return np.array(
+        [
+            index
+            for index, (uid, stamp) in enumerate(zip(snapshot.uids, snapshot.timestamps))
+            if since is None or (stamp is not None and stamp > since) or uid not in current
+        ],
+        dtype=np.int64,
+    )
+
+
+def _rescored_threshold(
+    snapshot: _Snapshot,
+    source: int,
+    matches: List[int],
+    weights: RankWeights,
+    now: datetime,
+) -> float:
+    """Lowest score among ``source``'s stored matches, recomputed at ``now``."""
+    similarities = snapshot.matrix[matches] @ snapshot.matrix[source]
+    ranked = rerank(
+        snapshot.texts[source],
+        [snapshot.texts[index] for index in matches],
+        1.0 - similarities,
+        [snapshot.timestamps[index] for index in matches],
+        len(matches),
+        document_terms=[snapshot.terms[index] for index in matches],
+        weights=weights,
+        min_score=-np.inf,
+        now=now,
+    )
+    return max(MIN_FINAL_SCORE, min(candidate.final_score for candidate in ranked))
+
+
+def _affected_sources(
+    snapshot: _Snapshot,
+    changed: np.ndarray,
+    current: Dict[str, List[Tuple[str, float]]],
+    top_k: int,
+    weights: RankWeights,
+    block_size: int,
+    executor: ThreadPoolExecutor,
+    now: datetime,
+) -> np.ndarray:
+    position = {uid: index for index, uid in enumerate(snapshot.uids)}
+    affected = np.zeros(len(snapshot.uids), dtype=bool)
+    affected[changed] = True
+
+    changed_uids = {snapshot.uids[index] for index in changed}
+    thresholds = np.full(len(snapshot.uids), MIN_FINAL_SCORE, dtype=np.float64)
+    for uid, index in position.items():
+        if affected[index]:
+            continue
+        matches = current.get(uid, [])
+        if any(match not in position or match in changed_uids for match, _ in matches):
+            affected[index] = True
+        elif len(matches) >= top_k:
+            thresholds[index] = _rescored_threshold(
+                snapshot, index, [position[match] for match, _ in matches], weights, now
+            )
+
+    if changed.size:
+        best = _best_similarity(snapshot.matrix, changed, block_size, executor)
+        bound = weights.similarity * np.maximum(best, 0.0) + weights.lexical + weights.recency
+        affected |= bound >= thresholds
+
+    return np.flatnonzero(affected)
+
+
+def _score_block(
+    snapshot: _Snapshot,
+    rows: np.ndarray,
+    candidates: np.ndarray,
+    similarities: np.ndarray,
+    top_k: int,
+    weights: RankWeights,
+    now: datetime,
+) -> List[Tuple[str, int, str, float, float]]:
+    records = []
+    for source, row_candidates, row_similarities in zip(rows, candidates, similarities):
+        valid = np.isfinite(row_similarities)
+        row_candidates = row_candidates[valid]
+        ranked = rerank(
+            snapshot.texts[source],
+            [snapshot.texts[index] for index in row_candidates],
+            1.0 - row_similarities[valid],
+            [snapshot.timestamps[index] for index in row_candidates],
+            top_k,
+            document_terms=[snapshot.terms[index] for index in row_candidates],
+            weights=weights,
+            now=now,
+        )
+        records.extend(
+            (
+                snapshot.uids[source],
+                rank,
+                snapshot.uids[row_candidates[candidate.index]],
+                candidate.final_score,
+                candidate.distance,
+            )
+            for rank, candidate in enumerate(ranked, start=1)
+        )
+    return records
+
+
+def _score_sources(
+    snapshot: _Snapshot,
+    sources: np.ndarray,
+    pool: int,
+    top_k: int,
+    weights: RankWeights,
+    block_size: int,
+    executor: ThreadPoolExecutor,
+    now: datetime,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> List[Tuple[str, int, str, float, float]]:
+    """``vibe_matches`` rows for ``sources``, scored as of ``now``."""
+    records: List[Tuple[str, int, str, float, float]] = []
+    if pool <= 0 or not sources.size:
+        return records
+
+    blocks = _blocks(sources, block_size)
+    done = 0
+    for rows, (candidates, similarities) in zip(
+        blocks,
+        executor.map(lambda rows: _block_candidates(snapshot.matrix, rows, pool), blocks),
+    ):
+        records.extend(_score_block(snapshot, rows, candidates, similarities, top_k, weights, now))
+        done += len(rows)
+        if progress:
+            progress(done, len(sources))
+    return records
+
+
+def _needs_full_refresh(state, model: str, top_k: int, now: datetime) -> bool:
+    if state is None or state[1] != model or state[2] != top_k:
+        return True
+    max_age = get_settings().match_graph_full_refresh_days
+    full_refreshed_at = state[3]
+    return max_age > 0 and (
+        full_refreshed_at is None or now - full_refreshed_at > timedelta(days=max_age)
+    )
+
+
+def refresh_match_graph(
+    *,
+    top_k: int = 10,
+    full: bool = False,
+    block_size: int = 1024,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> MatchGraphResult:
+    """Recompute ``vibe_matches`` for every source whose top-k may have changed.
+
+    ``full`` (implied when the model or ``top_k`` differ from the last run, or
+    the last full run is older than ``MATCH_GRAPH_FULL_REFRESH_DAYS``)
+    recomputes every source. ``progress`` receives ``(done, total)`` sources
+    after each block. The graph is replaced in a single transaction.
+    """
+    started = time.perf_counter()
+    settings = get_settings()
+    model = settings.active_embedding_model
+    weights = RankWeights.from_settings()
+    # One clock for the whole run, so every score decays to the same instant.
+    now = datetime.now(UTC)
+
+    try:
+        with get_connection() as conn, conn.transaction(), conn.cursor() as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+            snapshot = _load_snapshot(cur, model)
+            cur.execute(_STATE_SQL)
+            state = cur.fetchone()
+            full = full or _needs_full_refresh(state, model, top_k, now)
+
+            current: Dict[str, List[Tuple[str, float]]] = {}
+            if not full:
+                cur.execute(_CURRENT_MATCHES_SQL)
+                for uid, match_uid, score in cur:
+                    current.setdefault(uid, []).append((match_uid, score))
+
+            count = len(snapshot.uids)
+            pool = min(max(top_k, top_k * settings.search_candidate_multiplier), count - 1)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="match-graph") as executor:
+                if full:
+                    sources = np.arange(count)
+                else:
+                    since = state[0] - WATERMARK_OVERLAP if state[0] else None
+                    sources = _affected_sources(
+                        snapshot,
+                        _changed_rows(snapshot, since, current),
+                        current,
+                        top_k,
+                        weights,
+                        block_size,
+                        executor,
+                        now,
+                    )
+                records = _score_sources(
+                    snapshot, sources, pool, top_k, weights, block_size, executor, now, progress
+                )
+
+            if full:
+                cur.execute("TRUNCATE vibe_matches;")
+            else:
+                cur.execute(_DELETE_ORPHANS_SQL, (model,))
+                cur.execute(_DELETE_SOURCES_SQL, ([snapshot.uids[index] for index in sources],))
+            with cur.copy(_COPY_SQL) as copy:
+                for record in records:
+                    copy.write_row(record)
+            cur.execute(
+                _SAVE_STATE_SQL,
+                {"watermark": snapshot.watermark, "model": model, "top_k": top_k, "full": full},
+            )
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to refresh match graph: {exc}") from exc
+
+    return MatchGraphResult(
+        sources=len(snapshot.uids),
+        refreshed=int(sources.size),
+        full=full,
+        seconds=time.perf_counter() - started,
+    )
@@ -0,0 +1,147 @@
+"""Per-stage latency histograms and counters.
+
+``timed("stage")`` works as a context manager or decorator (sync or async)
+and records into a process-wide histogram ``vibes_stage_seconds``; inside a
+web request the same durations are summed per stage for the
+``Server-Timing`` header. With ``METRICS_ENABLED=false`` both are no-ops
+apart from a settings lookup. :func:`render_prometheus` produces the text
+served at ``/metrics``.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from .settings import get_settings
+
+# Seconds; spans a memoized normalization up to a slow embedding call.
+BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_lock = threading.Lock()
+# stage -> (per-bucket counts with a trailing +Inf slot, [sum])
+_histograms: Dict[str, Tuple[List[int], List[float]]] = {}
+_counters: Dict[str, float] = {}
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "vibes_request_timings", default=None
+)
+
+
+def enabled() -> bool:
+    return get_settings().metrics_enabled
+
+
+def observe(stage: str, seconds: float) -> None:
+    if not enabled():
+        return
+
+    with _lock:
+        buckets, totals = _histograms.setdefault(stage, ([0] * (len(BUCKETS) + 1), [0.0]))
+        buckets[bisect_left(BUCKETS, seconds)] += 1
+        totals[0] += seconds
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def increment(name: str, amount: float = 1) -> None:
+    if not enabled():
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+class timed:
+    """Time a block (``with timed("ann")``) or a function (``@timed("ann")``)."""
+
+    __slots__ = ("stage", "_started")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self._started: Optional[float] = None
+
+    def __enter__(self) -> "timed":
+        if enabled():
+            self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        if self._started is not None:
+            observe(self.stage, time.perf_counter() - self._started)
+            self._started = None
+        return False
+
+    def __call__(self, func: Callable) -> Callable:
+        stage = self.stage
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def start_request() -> Optional[Dict[str, float]]:
+    """Begin collecting stage timings for the current request context."""
+    if not enabled():
+        return None
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: Mapping[str, float]) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def _labels(**labels: object) -> str:
+    # Stage names are fixed identifiers from this package, so no escaping.
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(
+    gauges: Optional[Mapping[str, float]] = None,
+    counters: Optional[Mapping[str, float]] = None,
+) -> str:
+    """Prometheus text exposition of the histograms and counters recorded here,
+    plus externally tracked ``gauges`` and monotonic ``counters``."""
+    with _lock:
+        histograms = {stage: (list(buckets), totals[0]) for stage, (buckets, totals) in _histograms.items()}
+        counters = {**_counters, **(counters or {})}
+
+    lines = [
+        "# HELP vibes_stage_seconds Time spent per pipeline stage.",
+        "# TYPE vibes_stage_seconds histogram",
+    ]
+    for stage, (buckets, total) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), buckets):
+            cumulative += count
+            lines.append(f"vibes_stage_seconds_bucket{_labels(stage=stage, le=bound)} {cumulative}")
+        lines.append(f"vibes_stage_seconds_sum{_labels(stage=stage)} {total}")
+        lines.append(f"vibes_stage_seconds_count{_labels(stage=stage)} {cumulative}")
+
+    for name, value in sorted(counters.items()):
+        lines.append(f"# TYPE vibes_{name} counter")
+        lines.append(f"vibes_{name} {value}")
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE vibes_{name} gauge")
+        lines.append(f"vibes_{name} {value}")
+    return "\n".join(lines) + "\n"
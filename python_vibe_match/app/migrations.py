@@ -0,0 +1,423 @@
+"""Versioned schema migrations applied by ``manage_vibes.py migrate``.
+
+Every step is idempotent (``IF NOT EXISTS`` and friends) so databases created
+from ``db/init.sql`` or patched by older releases converge on the same schema.
+Applied versions are recorded in ``schema_migrations``; the app only checks
+that record at startup and never alters tables from a request.
+"""
+
+from __future__ import annotations
+
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from psycopg import sql
+
+from .db import get_async_connection, get_connection
+from .errors import DatabaseError
+from .settings import get_settings
+from .storage import COMPACT_COLUMN, compact_trigger_sql
+
+# Arbitrary key for pg_advisory_lock so concurrent `migrate` runs serialize.
+_MIGRATION_LOCK_KEY = 424242
+# Rows of vibes_version; concurrent writers rarely share one.
+VERSION_SLOTS = 64
+
+_MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+_CURRENT_VERSION_SQL = """
+SELECT CASE
+    WHEN to_regclass('schema_migrations') IS NULL THEN 0
+    ELSE (SELECT COALESCE(MAX(version), 0) FROM schema_migrations)
+END;
+"""
+_APPLIED_SQL = "SELECT version FROM schema_migrations;"
+_RECORD_SQL = "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);"
+# A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind that
+# IF NOT EXISTS would then skip, so such leftovers are dropped and rebuilt.
+_INVALID_INDEXES_SQL = """
+SELECT c.relname
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE c.relname = ANY(%s) AND pg_table_is_visible(c.oid) AND NOT i.indisvalid;
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    transactional: bool = True
+    # Indexes the step builds CONCURRENTLY, checked for INVALID leftovers.
+    indexes: Tuple[str, ...] = ()
+
+
+@lru_cache(maxsize=1)
+def migrations() -> Tuple[Migration, ...]:
+    settings = get_settings()
+    dimension = settings.embedding_dimension
+    compact_dimension = settings.compact_embedding_dimension
+    return (
+        Migration(
+            1,
+            "create vibes",
+            (
+                "CREATE EXTENSION IF NOT EXISTS vector;",
+                f"""
+                CREATE TABLE IF NOT EXISTS vibes (
+                    uid TEXT PRIMARY KEY,
+                    vibe TEXT NOT NULL,
+                    embedding VECTOR({dimension}) NOT NULL,
+                    embedding_model TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """,
+            ),
+        ),
+        Migration(
+            2,
+            "add original_vibe",
+            (
+                "ALTER TABLE vibes ADD COLUMN IF NOT EXISTS original_vibe TEXT;",
+                "UPDATE vibes SET original_vibe = vibe WHERE original_vibe IS NULL;",
+                "ALTER TABLE vibes ALTER COLUMN original_vibe SET NOT NULL;",
+            ),
+        ),
+        Migration(
+            3,
+            "bump updated_at on content edits only",
+            (
+                """
+                CREATE OR REPLACE FUNCTION set_updated_at()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF NEW.original_vibe IS DISTINCT FROM OLD.original_vibe
+                       OR NEW.vibe IS DISTINCT FROM OLD.vibe THEN
+                        NEW.updated_at = NOW();
+                    END IF;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+                """,
+                "DROP TRIGGER IF EXISTS vibes_set_updated_at ON vibes;",
+                """
+                CREATE TRIGGER vibes_set_updated_at
+                BEFORE UPDATE ON vibes
+                FOR EACH ROW
+                EXECUTE PROCEDURE set_updated_at();
+                """,
+            ),
+        ),
+        Migration(
+            4,
+            "add vibe_terms",
+            (
+                # A constant default is metadata-only; existing rows are
+                # filled by `manage_vibes.py backfill-terms`.
+                "ALTER TABLE vibes ADD COLUMN IF NOT EXISTS vibe_terms TEXT[] NOT NULL DEFAULT '{}';",
+            ),
+        ),
+        Migration(
+            5,
+            "index vibe_terms",
+            (
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS vibes_terms_idx "
+                "ON vibes USING gin (vibe_terms);",
+            ),
+            transactional=False,
+            indexes=("vibes_terms_idx",),
+        ),
+        Migration(
+            6,
+            "create embedding_cache",
+            (
+                """
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    embedding_model TEXT NOT NULL,
+                    dimension INTEGER NOT NULL,
+                    embedding BYTEA NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """,
+            ),
+        ),
+        Migration(
+            7,
+            "create vibes_index_config",
+            (
+                """
+                CREATE TABLE IF NOT EXISTS vibes_index_config (
+                    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                    strategy TEXT NOT NULL,
+                    lists INTEGER,
+                    probes INTEGER,
+                    m INTEGER,
+                    ef_construction INTEGER,
+                    ef_search INTEGER,
+                    row_count BIGINT NOT NULL,
+                    built_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """,
+            ),
+        ),
+        Migration(
+            8,
+            "add content_hash",
+            (
+                # A plain nullable column is metadata-only; the trigger from
+                # migration 12 fills it and readers fall back to md5().
+                "ALTER TABLE vibes ADD COLUMN IF NOT EXISTS content_hash TEXT;",
+            ),
+        ),
+        Migration(
+            9,
+            "index vibes by (updated_at, uid)",
+            (
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS vibes_updated_at_uid_idx "
+                "ON vibes (updated_at DESC, uid DESC);",
+            ),
+            transactional=False,
+            indexes=("vibes_updated_at_uid_idx",),
+        ),
+        Migration(
+            10,
+            "track vibes table version",
+            (
+                """
+                CREATE TABLE IF NOT EXISTS vibes_version (
+                    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                    version BIGINT NOT NULL
+                );
+                """,
+                "INSERT INTO vibes_version (id, version) VALUES (TRUE, 1) ON CONFLICT (id) DO NOTHING;",
+                # Statement-level, so bulk writes bump the version once and
+                # writers outside this service are covered too.
+                """
+                CREATE OR REPLACE FUNCTION bump_vibes_version()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    UPDATE vibes_version SET version = version + 1;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+                """,
+                "DROP TRIGGER IF EXISTS vibes_bump_version ON vibes;",
+                """
+                CREATE TRIGGER vibes_bump_version
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vibes
+                FOR EACH STATEMENT
+                EXECUTE PROCEDURE bump_vibes_version();
+                """,
+            ),
+        ),
+        Migration(
+            11,
+            "create vibe_matches",
+            (
+                """
+                CREATE TABLE IF NOT EXISTS vibe_matches (
+                    uid TEXT NOT NULL,
+                    rank SMALLINT NOT NULL,
+                    match_uid TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    distance REAL NOT NULL,
+                    computed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (uid, rank)
+                );
+                """,
+                "CREATE INDEX IF NOT EXISTS vibe_matches_match_uid_idx ON vibe_matches (match_uid);",
+                """
+                CREATE TABLE IF NOT EXISTS vibe_match_state (
+                    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                    watermark TIMESTAMPTZ,
+                    embedding_model TEXT NOT NULL,
+                    top_k INTEGER NOT NULL,
+                    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """,
+            ),
+        ),
+        Migration(
+            12,
+            "maintain content_hash by trigger",
+            (
+                # Databases that ran the original migration 8 hold a stored
+                # generated column; dropping the expression keeps the values
+                # and does not rewrite the table.
+                "ALTER TABLE vibes ALTER COLUMN content_hash DROP EXPRESSION IF EXISTS;",
+                """
+                CREATE OR REPLACE FUNCTION set_content_hash()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    NEW.content_hash = md5(NEW.original_vibe);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+                """,
+                "DROP TRIGGER IF EXISTS vibes_set_content_hash ON vibes;",
+                # Every writer, including the Symfony fallback, keeps it in sync.
+                """
+                CREATE TRIGGER vibes_set_content_hash
+                BEFORE INSERT OR UPDATE OF original_vibe ON vibes
+                FOR EACH ROW
+                EXECUTE PROCEDURE set_content_hash();
+                """,
+            ),
+        ),
+        Migration(
+            13,
+            "index vibes.embedding",
+            (
+                # Same shape as db/init.sql; `manage_vibes.py index` re-tunes
+                # or replaces it once the table has data.
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS vibes_embedding_idx "
+                "ON vibes USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {int(settings.hnsw_m)}, "
+                f"ef_construction = {int(settings.hnsw_ef_construction)});",
+            ),
+            transactional=False,
+            indexes=("vibes_embedding_idx",),
+        ),
+        Migration(
+            14,
+            "add embedding_compact",
+            (
+                # Nullable without a default, so metadata-only; existing rows
+                # are filled (and indexed) by `manage_vibes.py compact`.
+                f"ALTER TABLE vibes ADD COLUMN IF NOT EXISTS {COMPACT_COLUMN} "
+                f"HALFVEC({int(compact_dimension)});",
+                compact_trigger_sql(compact_dimension),
+            ),
+        ),
+        Migration(
+            15,
+            "shard vibes_version",
+            (
+                # One counter row made every write transaction queue on the
+                # same row lock. Each backend now bumps one of
+                # VERSION_SLOTS rows and readers sum them; unlike a sequence,
+                # the bump only becomes visible when the write commits.
+                "ALTER TABLE vibes_version ADD COLUMN IF NOT EXISTS slot SMALLINT NOT NULL DEFAULT 0;",
+                "ALTER TABLE vibes_version DROP COLUMN IF EXISTS id;",
+                "ALTER TABLE vibes_version DROP CONSTRAINT IF EXISTS vibes_version_pkey, "
+                "ADD PRIMARY KEY (slot);",
+                "INSERT INTO vibes_version (slot, version) "
+                f"SELECT slot, 0 FROM generate_series(1, {VERSION_SLOTS - 1}) AS slot "
+                "ON CONFLICT (slot) DO NOTHING;",
+                f"""
+                CREATE OR REPLACE FUNCTION bump_vibes_version()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    UPDATE vibes_version SET version = version + 1
+                    WHERE slot = pg_backend_pid() % {VERSION_SLOTS};
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+                """,
+            ),
+        ),
+        Migration(
+            16,
+            "track full match graph refreshes",
+            (
+                "ALTER TABLE vibe_match_state ADD COLUMN IF NOT EXISTS full_refreshed_at TIMESTAMPTZ;",
+            ),
+        ),
+    )
+
+
+def latest_version() -> int:
+    return migrations()[-1].version
+
+
+def current_version() -> int:
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(_CURRENT_VERSION_SQL)
+            return int(cur.fetchone()[0])
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to read schema version: {exc}") from exc
+
+
+async def current_version_async() -> int:
+    try:
+        async with get_async_connection() as conn, conn.cursor() as cur:
+            await cur.execute(_CURRENT_VERSION_SQL)
+            return int((await cur.fetchone())[0])
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to read schema version: {exc}") from exc
+
+
+def _drop_invalid_indexes(conn, migration: Migration) -> List[str]:
+    """Drop INVALID leftovers of ``migration``'s concurrent index builds."""
+    if not migration.indexes:
+        return []
+    with conn.cursor() as cur:
+        cur.execute(_INVALID_INDEXES_SQL, (list(migration.indexes),))
+        invalid = [row[0] for row in cur.fetchall()]
+        for name in invalid:
+            cur.execute(
+                sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {};").format(sql.Identifier(name))
+            )
+    return invalid
+
+
+def migrate(
+    target: Optional[int] = None,
+    *,
+    progress: Optional[Callable[[Migration], None]] = None,
+) -> List[Migration]:
+    """Apply pending migrations up to ``target`` (default: latest) in order.
+
+    Returns the migrations applied by this call. ``progress`` is invoked
+    before each one runs.
+    """
+    target = target or latest_version()
+    applied: List[Migration] = []
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_lock(%s);", (_MIGRATION_LOCK_KEY,))
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(_MIGRATIONS_TABLE_SQL)
+                    cur.execute(_APPLIED_SQL)
+                    done = {row[0] for row in cur.fetchall()}
+
+                for migration in migrations():
+                    if migration.version > target:
+                        continue
+                    if migration.version in done:
+                        # Rebuild indexes left INVALID by an earlier failure.
+                        if _drop_invalid_indexes(conn, migration):
+                            with conn.cursor() as cur:
+                                for statement in migration.statements:
+                                    cur.execute(statement)
+                        continue
+                    _drop_invalid_indexes(conn, migration)
+                    if progress:
+                        progress(migration)
+                    block = conn.transaction() if migration.transactional else nullcontext()
+                    with block, conn.cursor() as cur:
+                        for statement in migration.statements:
+                            cur.execute(statement)
+                        cur.execute(_RECORD_SQL, (migration.version, migration.name))
+                    applied.append(migration)
+            finally:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s);", (_MIGRATION_LOCK_KEY,))
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to apply schema migrations: {exc}") from exc
+
+    return applied
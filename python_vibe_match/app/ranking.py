@@ -0,0 +1,147 @@
+"""Vectorized re-ranking of nearest-neighbour candidates."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+from .settings import get_settings
+
+_OVERLAP_STOPWORDS = {
+    "i",
+    "want",
+    "to",
+    "like",
+    "would",
+    "some",
+    "any",
+    "the",
+    "a",
+    "an",
+    "language",
+    "speak",
+    "play",
+    "learn",
+    "practice",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+# e-folding time of the recency term: exp(-age_days / RECENCY_DECAY_DAYS).
+RECENCY_DECAY_DAYS = 60.0
+MIN_FINAL_SCORE = 0.35
+
+
+@dataclass(frozen=True)
+class RankWeights:
+    similarity: float = 0.80
+    lexical: float = 0.15
+    recency: float = 0.05
+
+    @classmethod
+    def from_settings(cls) -> "RankWeights":
+        settings = get_settings()
+        return cls(
+            similarity=settings.rank_weight_similarity,
+            lexical=settings.rank_weight_lexical,
+            recency=settings.rank_weight_recency,
+        )
+
+
+@dataclass
+class RankedCandidate:
+    index: int
+    distance: float
+    lexical_overlap: float
+    recency_decay: float
+    final_score: float
+    overlap_terms: List[str]
+
+
+def overlap_terms(text: str) -> Set[str]:
+    """Stopword-filtered term set used for lexical overlap scoring."""
+    return {
+        term
+        for term in _TOKEN_RE.findall(text.lower())
+        if term and term not in _OVERLAP_STOPWORDS
+    }
+
+
+def vibe_terms(text: str) -> List[str]:
+    """Sorted term list persisted in ``vibes.vibe_terms`` at write time."""
+    return sorted(overlap_terms(text))
+
+
+def rerank(
+    query: str,
+    documents: Sequence[str],
+    distances: Sequence[float],
+    timestamps: Sequence[Optional[datetime]],
+    top_k: int,
+    *,
+    document_terms: Optional[Sequence[Optional[Iterable[str]]]] = None,
+    weights: Optional[RankWeights] = None,
+    min_score: float = MIN_FINAL_SCORE,
+    now: Optional[datetime] = None,
+) -> List[RankedCandidate]:
+    """Score candidates in bulk and return the best ``top_k`` above ``min_score``.
+
+    ``timestamps`` holds each candidate's ``updated_at`` (or ``created_at``)
+    value; ``None`` yields zero recency. Recency is measured at ``now``
+    (default: the current time). ``document_terms`` carries the
+    precomputed ``vibe_terms`` per candidate; empty entries fall back to
+    tokenizing the document text.
+    """
+    count = len(documents)
+    if count == 0 or top_k <= 0:
+        return []
+
+    weights = weights or RankWeights.from_settings()
+
+    distance = np.asarray(distances, dtype=np.float64)
+    similarity = np.clip(1.0 - distance, 0.0, None)
+
+    query_terms = overlap_terms(query)
+    overlaps: List[List[str]] = [[] for _ in range(count)]
+    lexical = np.zeros(count, dtype=np.float64)
+    if query_terms:
+        for position, document in enumerate(documents):
+            terms = document_terms[position] if document_terms is not None else None
+            shared = query_terms.intersection(terms or overlap_terms(document))
+            if shared:
+                overlaps[position] = sorted(shared)
+                lexical[position] = len(shared) / len(query_terms)
+
+    now = (now or datetime.now(UTC)).timestamp()
+    epochs = np.array(
+        [stamp.timestamp() if stamp is not None else np.nan for stamp in timestamps],
+        dtype=np.float64,
+    )
+    age_days = np.maximum((now - epochs) / 86400.0, 0.0)
+    recency = np.nan_to_num(np.exp(-age_days / RECENCY_DECAY_DAYS), nan=0.0)
+
+    final = (
+        weights.similarity * similarity
+        + weights.lexical * lexical
+        + weights.recency * recency
+    )
+
+    eligible = np.flatnonzero(final >= min_score)
+    if eligible.size > top_k:
+        partition = np.argpartition(-final[eligible], top_k - 1)[:top_k]
+        eligible = eligible[partition]
+    ordered = eligible[np.argsort(-final[eligible], kind="stable")]
+
+    return [
+        RankedCandidate(
+            index=int(position),
+            distance=float(distance[position]),
+            lexical_overlap=float(lexical[position]),
+            recency_decay=float(recency[position]),
+            final_score=float(final[position]),
+            overlap_terms=overlaps[position],
+        )
+        for position in ordered
+    ]
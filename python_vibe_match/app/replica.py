@@ -0,0 +1,262 @@
+"""In-process replica of the vibes vectors for local nearest-neighbour search.
+
+With ``VECTOR_REPLICA=true`` each web worker keeps the searchable rows (only
+the active model's with ``SEARCH_MODEL_FILTER``) in a float32 NumPy matrix
+and answers ``rerank``-mode searches with one matrix-vector product instead
+of a Postgres round trip. A background task polls the ``vibes_version``
+counter every ``VECTOR_REPLICA_POLL_INTERVAL`` seconds and, when it moved,
+pulls only rows updated since the watermark (plus rows that appeared through
+re-embedding) and drops deleted ones. Searches fall back to Postgres whenever
+the last successful sync is older than ``VECTOR_REPLICA_MAX_STALENESS``.
+
+With ``VECTOR_REPLICA_SNAPSHOT_DIR`` set, the state is written as one ``.npz``
+archive holding the version, the uids in matrix order, the row metadata and
+the matrix; new workers load it and only fetch the delta since the snapshot.
+
+States are immutable and swapped atomically, so searches never see a
+half-applied update.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .db import get_connection
+from .errors import DatabaseError
+from .match_graph import WATERMARK_OVERLAP
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_VERSION_SQL = "SELECT sum(version)::bigint FROM vibes_version;"
+# %(model)s is NULL when SEARCH_MODEL_FILTER is off and every row is searchable.
+_MODEL_FILTER = "(%(model)s::text IS NULL OR embedding_model = %(model)s)"
+_UIDS_SQL = f"SELECT uid, embedding_model FROM vibes WHERE {_MODEL_FILTER};"
+_ROWS_SQL = f"""
+SELECT uid, original_vibe, vibe, embedding_model, updated_at, created_at, vibe_terms, embedding
+FROM vibes
+WHERE {_MODEL_FILTER}
+"""
+_DELTA_SQL = _ROWS_SQL + "AND (updated_at > %(since)s OR uid = ANY(%(appeared)s))"
+
+
+@dataclass(frozen=True)
+class _State:
+    version: int
+    # (uid, original_vibe, vibe, embedding_model, updated_at, created_at, vibe_terms)
+    rows: List[tuple]
+    matrix: np.ndarray
+    position: Dict[str, int]
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        stamps = [row[4] for row in self.rows if row[4] is not None]
+        return max(stamps) if stamps else None
+
+
+def _build_state(version: int, rows: List[tuple], vectors: Sequence) -> _State:
+    dimension = get_settings().embedding_dimension
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(rows), dimension)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return _State(version, rows, matrix, {row[0]: index for index, row in enumerate(rows)})
+
+
+class VectorReplica:
+    def __init__(self, model: Optional[str], snapshot_dir: Optional[str] = None) -> None:
+        self.model = model
+        self._snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self._state: Optional[_State] = None
+        self._synced_at = float("-inf")
+        self._sync_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._state.rows) if self._state else 0
+
+    def fresh(self) -> bool:
+        max_staleness = get_settings().vector_replica_max_staleness
+        return self._state is not None and time.monotonic() - self._synced_at <= max_staleness
+
+    def search(self, vector: Sequence[float], pool: int) -> List[tuple]:
+        """Nearest ``pool`` rows shaped like ``vibes._SEARCH_TEMPLATE`` results."""
+        state = self._state
+        if state is None or not state.rows:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        similarities = state.matrix @ query
+        pool = min(pool, len(state.rows))
+        candidates = np.argpartition(-similarities, pool - 1)[:pool]
+        candidates = candidates[np.argsort(-similarities[candidates], kind="stable")]
+        return [
+            (*state.rows[index][:4], float(1.0 - similarities[index]), *state.rows[index][4:])
+            for index in candidates
+        ]
+
+    def sync(self) -> bool:
+        """Bring the replica up to date; returns ``True`` if anything changed."""
+        with self._sync_lock:
+            try:
+                with get_connection() as conn, conn.cursor() as cur:
+                    cur.execute(_VERSION_SQL)
+                    version = int(cur.fetchone()[0])
+
+                    if self._state is None:
+                        self._state = self._load_snapshot()
+                    state = self._state
+                    if state is not None and state.version == version:
+                        changed = False
+                    elif state is None or state.watermark is None:
+                        self._state = self._full_load(cur, version)
+                        self._write_snapshot(self._state)
+                        changed = True
+                    else:
+                        self._state = self._apply_delta(cur, state, version)
+                        changed = True
+            except Exception as exc:  # pragma: no cover
+                raise DatabaseError(f"Failed to sync vector replica: {exc}") from exc
+
+            self._synced_at = time.monotonic()
+            return changed
+
+    def _full_load(self, cur, version: int) -> _State:
+        cur.execute(_ROWS_SQL, {"model": self.model})
+        rows, vectors = [], []
+        for row in cur:
+            rows.append(row[:7])
+            vectors.append(row[7])
+        return _build_state(version, rows, vectors)
+
+    def _apply_delta(self, cur, state: _State, version: int) -> _State:
+        # Versions are read before rows, so a write racing this sync is only
+        # ever applied twice, never missed.
+        cur.execute(_UIDS_SQL, {"model": self.model})
+        current = dict(cur.fetchall())
+        # Re-embedding changes the model without touching updated_at.
+        appeared = [
+            uid
+            for uid, model in current.items()
+            if uid not in state.position or state.rows[state.position[uid]][3] != model
+        ]
+
+        cur.execute(
+            _DELTA_SQL,
+            {
+                "model": self.model,
+                "since": state.watermark - WATERMARK_OVERLAP,
+                "appeared": appeared,
+            },
+        )
+        delta = cur.fetchall()
+        replaced = {row[0] for row in delta}
+
+        keep = [
+            index
+            for index, row in enumerate(state.rows)
+            if row[0] in current and row[0] not in replaced
+        ]
+        rows = [state.rows[index] for index in keep] + [row[:7] for row in delta]
+        vectors = np.empty((len(rows), state.matrix.shape[1]), dtype=np.float32)
+        vectors[: len(keep)] = state.matrix[keep]
+        for offset, row in enumerate(delta, start=len(keep)):
+            vectors[offset] = row[7]
+        return _build_state(version, rows, vectors)
+
+    def _snapshot_path(self) -> Path:
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model or "all-models")
+        return self._snapshot_dir / f"vibes-{slug}-{get_settings().embedding_dimension}.npz"
+
+    def save_snapshot(self) -> None:
+        """Persist the current state; serialized with :meth:`sync`."""
+        with self._sync_lock:
+            if self._state is not None:
+                self._write_snapshot(self._state)
+
+    def _write_snapshot(self, state: _State) -> None:
+        if self._snapshot_dir is None:
+            return
+
+        self._snapshot_dir.mkdir(parents=True, exist_ok=True)
+        path = self._snapshot_path()
+        rows = [
+            [*row[:4], *(stamp.isoformat() if stamp else None for stamp in row[4:6]), row[6]]
+            for row in state.rows
+        ]
+        # Write-then-rename under a unique name, so concurrent writers (other
+        # workers) never interleave and readers never see a partial file.
+        with tempfile.NamedTemporaryFile(
+            dir=self._snapshot_dir, prefix=f"{path.stem}.", suffix=".tmp", delete=False
+        ) as handle:
+            try:
+                np.savez(
+                    handle,
+                    version=np.int64(state.version),
+                    model=np.str_(self.model or ""),
+                    uids=np.array([row[0] for row in state.rows], dtype=np.str_),
+                    rows=np.str_(json.dumps(rows)),
+                    matrix=state.matrix,
+                )
+            except BaseException:
+                os.unlink(handle.name)
+                raise
+        os.replace(handle.name, path)
+
+    def _load_snapshot(self) -> Optional[_State]:
+        if self._snapshot_dir is None:
+            return None
+        try:
+            with np.load(self._snapshot_path(), allow_pickle=False) as archive:
+                version = int(archive["version"])
+                model = str(archive["model"])
+                uids = archive["uids"].tolist()
+                meta_rows = json.loads(str(archive["rows"]))
+                matrix = archive["matrix"]
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # Reject archives from another model or dimension, and any whose
+        # matrix rows do not line up with the uids they are labelled with.
+        if model != (self.model or "") or matrix.shape[1:] != (get_settings().embedding_dimension,):
+            return None
+        if len(matrix) != len(uids) or uids != [row[0] for row in meta_rows]:
+            return None
+
+        rows = [
+            (*row[:4], *(datetime.fromisoformat(stamp) if stamp else None for stamp in row[4:6]), row[6])
+            for row in meta_rows
+        ]
+        return _State(version, rows, matrix, {row[0]: index for index, row in enumerate(rows)})
+
+    async def poll_forever(self) -> None:
+        """Background task body: sync every ``VECTOR_REPLICA_POLL_INTERVAL`` seconds."""
+        interval = get_settings().vector_replica_poll_interval
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+            except DatabaseError as exc:
+                # Searches fall back to Postgres once the replica is stale.
+                logger.warning("Vector replica sync failed: %s", exc)
+            await asyncio.sleep(interval)
+
+
+@lru_cache(maxsize=1)
+def get_replica() -> Optional[VectorReplica]:
+    settings = get_settings()
+    if not settings.vector_replica:
+        return None
+    model = settings.active_embedding_model if settings.search_model_filter else None
+    return VectorReplica(model, settings.vector_replica_snapshot_dir)
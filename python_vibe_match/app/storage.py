@@ -0,0 +1,160 @@
+"""Compact ``halfvec`` copy of each embedding for a smaller ANN index.
+
+``vibes.embedding_compact`` holds the first ``COMPACT_EMBEDDING_DIMENSION``
+components of the full vector, re-normalized and stored as half precision.
+OpenAI's ``text-embedding-3`` models are trained so such truncated prefixes
+remain usable embeddings (the API's ``dimensions`` option does the same).
+A trigger keeps the column in sync with ``embedding`` on every write, so the
+upsert paths are unchanged; search switches to it with
+``EMBEDDING_STORAGE=compact``.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from psycopg import sql
+
+from .db import get_connection
+from .errors import DatabaseError
+from .indexing import INDEX_NAME, IndexPlan, create_index_sql, plan_index
+from .settings import get_settings
+
+COMPACT_COLUMN = "embedding_compact"
+COMPACT_INDEX_NAME = "vibes_embedding_compact_idx"
+STORAGE_MODES = ("full", "compact")
+
+_COLUMN_DIMENSION_SQL = """
+SELECT a.atttypmod
+FROM pg_attribute a
+WHERE a.attrelid = 'vibes'::regclass
+  AND a.attname = %s
+  AND NOT a.attisdropped;
+"""
+_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION set_embedding_compact()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.embedding_compact = {compact};
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vibes_set_embedding_compact ON vibes;
+CREATE TRIGGER vibes_set_embedding_compact
+BEFORE INSERT OR UPDATE OF embedding ON vibes
+FOR EACH ROW
+EXECUTE FUNCTION set_embedding_compact();
+"""
+_BACKFILL_SQL = """
+UPDATE vibes
+SET embedding_compact = {compact}
+WHERE uid IN (
+    SELECT uid
+    FROM vibes
+    WHERE embedding_compact IS NULL
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+);
+"""
+
+
+def compact_expression(source: str, dimension: int) -> str:
+    """SQL turning the full ``vector`` expression ``source`` into its compact form."""
+    dimension = int(dimension)
+    return f"l2_normalize(subvector({source}, 1, {dimension}))::halfvec({dimension})"
+
+
+def compact_trigger_sql(dimension: int) -> str:
+    """Function and trigger keeping ``embedding_compact`` in sync with ``embedding``."""
+    return _TRIGGER_SQL.format(compact=compact_expression("NEW.embedding", dimension))
+
+
+def compact_enabled() -> bool:
+    storage = get_settings().embedding_storage
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown EMBEDDING_STORAGE '{storage}'; expected one of {STORAGE_MODES}.")
+    return storage == "compact"
+
+
+def _check_dimension(dimension: int) -> None:
+    full = get_settings().embedding_dimension
+    if not 1 <= dimension <= full:
+        raise ValueError(f"Compact dimension must be between 1 and {full}, got {dimension}.")
+
+
+def migrate_to_compact(
+    dimension: Optional[int] = None,
+    *,
+    batch_size: int = 1000,
+    plan: Optional[IndexPlan] = None,
+    drop_full_index: bool = False,
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Add and backfill ``vibes.embedding_compact`` and index it.
+
+    Re-running is safe: only rows without a compact vector are converted, in
+    batches committed one at a time. Changing ``dimension`` recreates the
+    column. ``drop_full_index`` removes the index on the full vector, which
+    is then only read to re-score the compact candidates. Returns the number
+    of rows converted.
+    """
+    dimension = dimension or get_settings().compact_embedding_dimension
+    _check_dimension(dimension)
+    plan = plan or plan_index("hnsw")
+
+    converted = 0
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(_COLUMN_DIMENSION_SQL, (COMPACT_COLUMN,))
+                row = cur.fetchone()
+                if row and row[0] != dimension:
+                    cur.execute("ALTER TABLE vibes DROP COLUMN embedding_compact;")
+                    row = None
+                if row is None:
+                    cur.execute(
+                        sql.SQL("ALTER TABLE vibes ADD COLUMN embedding_compact HALFVEC({});").format(
+                            sql.Literal(dimension)
+                        )
+                    )
+                cur.execute(compact_trigger_sql(dimension))
+
+            backfill = sql.SQL(_BACKFILL_SQL).format(
+                compact=sql.SQL(compact_expression("embedding", dimension))
+            )
+            while True:
+                with conn.cursor() as cur:
+                    cur.execute(backfill, (batch_size,))
+                    if cur.rowcount <= 0:
+                        break
+                    converted += cur.rowcount
+                if progress:
+                    progress(converted)
+
+            with conn.cursor() as cur:
+                cur.execute(
+                    sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {};").format(
+                        sql.Identifier(COMPACT_INDEX_NAME)
+                    )
+                )
+                if plan.strategy != "exact":
+                    cur.execute(
+                        create_index_sql(
+                            plan,
+                            COMPACT_INDEX_NAME,
+                            concurrently=True,
+                            column=COMPACT_COLUMN,
+                            opclass="halfvec_cosine_ops",
+                        )
+                    )
+                if drop_full_index:
+                    cur.execute(
+                        sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {};").format(
+                            sql.Identifier(INDEX_NAME)
+                        )
+                    )
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to migrate to compact embeddings: {exc}") from exc
+
+    return converted
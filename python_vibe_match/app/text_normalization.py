@@ -2,15 +2,21 @@ from __future__ import annotations
 
 import re
 from functools import lru_cache
-from typing import List
-
-import spacy
-from spacy.language import Language
+from typing import TYPE_CHECKING, Iterable, List, Optional
 
+from .cache import TTLCache
 from .errors import NormalizationError
+from .metrics import timed
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+    from spacy.tokens import Doc
 
 _TRAILING_PUNCTUATION = "?!.,;:"
 _WHITESPACE_RE = re.compile(r"\s+")
+# Only these components feed POS tags and lemmas; everything else is dead weight.
+_REQUIRED_PIPES = ("tok2vec", "tagger", "morphologizer", "attribute_ruler", "lemmatizer")
+_NORMALIZE_MEMO: TTLCache[tuple[str, bool], str] = TTLCache(maxsize=8192)
 
 # Longer prefixes should come first to avoid partial matches swallowing detail.
 _BOILERPLATE_PREFIXES: List[str] = [
@@ -33,18 +39,25 @@ def _strip_boilerplate_prefix(text: str) -> str:
 
 @lru_cache(maxsize=1)
 def _get_nlp() -> Language:
+    # spaCy is imported here rather than at module level so commands that
+    # never normalize text do not pay for it.
+    import spacy
+
     try:
-        return spacy.load("en_core_web_sm", disable=("parser", "ner", "textcat"))
+        nlp = spacy.load("en_core_web_sm", exclude=("parser", "senter", "ner", "textcat"))
     except OSError as exc:
         raise NormalizationError(
             "SpaCy model 'en_core_web_sm' is required. Install it via "
             "`python -m spacy download en_core_web_sm`."
         ) from exc
 
+    for name in nlp.pipe_names:
+        if name not in _REQUIRED_PIPES:
+            nlp.disable_pipe(name)
+    return nlp
 
-def _lemmatize_verbs(text: str) -> str:
-    nlp = _get_nlp()
-    doc = nlp(text)
+
+def _join_lemmas(doc: Doc) -> str:
     lemmas: List[str] = []
     for token in doc:
         if token.is_space:
@@ -59,7 +72,11 @@ def _lemmatize_verbs(text: str) -> str:
     return " ".join(lemmas)
 
 
-def normalize_text(raw: str, *, lemmatize_verbs: bool = True) -> str:
+def _lemmatize_verbs(text: str) -> str:
+    return _join_lemmas(_get_nlp()(text))
+
+
+def _clean_text(raw: str) -> str:
     if raw is None:
         raise NormalizationError("Cannot normalize missing text.")
 
@@ -75,7 +92,85 @@ def normalize_text(raw: str, *, lemmatize_verbs: bool = True) -> str:
     if not text:
         raise NormalizationError("Text normalization removed all content.")
 
+    return text
+
+
+@timed("normalize")
+def normalize_text(raw: str, *, lemmatize_verbs: bool = True) -> str:
+    if raw is None:
+        raise NormalizationError("Cannot normalize missing text.")
+
+    key = (raw, lemmatize_verbs)
+    cached = _NORMALIZE_MEMO.get(key)
+    if cached is not None:
+        return cached
+
+    text = _clean_text(raw)
     if lemmatize_verbs:
         text = _lemmatize_verbs(text)
 
+    _NORMALIZE_MEMO.set(key, text)
     return text
+
+
+@timed("normalize")
+def normalize_texts(
+    texts: Iterable[str],
+    *,
+    batch_size: int = 256,
+    n_process: int = 1,
+    lemmatize_verbs: bool = True,
+    strict: bool = True,
+    errors: Optional[List[Optional[str]]] = None,
+) -> List[Optional[str]]:
+    """Normalize many texts at once, running spaCy through ``nlp.pipe``.
+
+    Results keep input order. With ``strict=False`` entries that fail
+    normalization come back as ``None`` instead of raising, which lets bulk
+    callers skip bad records without losing the rest of the batch. Pass a
+    list as ``errors`` to receive each entry's failure message (``None`` for
+    entries that normalized), in the same order.
+    """
+    raw_texts = list(texts)
+    results: List[Optional[str]] = [None] * len(raw_texts)
+    failures: List[Optional[str]] = [None] * len(raw_texts)
+    pending: dict[str, List[int]] = {}
+
+    for index, raw in enumerate(raw_texts):
+        cached = _NORMALIZE_MEMO.get((raw, lemmatize_verbs)) if raw is not None else None
+        if cached is not None:
+            results[index] = cached
+            continue
+        try:
+            cleaned = _clean_text(raw)
+        except NormalizationError as exc:
+            if strict:
+                raise
+            failures[index] = str(exc)
+            continue
+        if lemmatize_verbs:
+            pending.setdefault(cleaned, []).append(index)
+        else:
+            results[index] = cleaned
+            _NORMALIZE_MEMO.set((raw, False), cleaned)
+
+    if pending:
+        try:
+            nlp = _get_nlp()
+        except NormalizationError as exc:
+            if strict:
+                raise
+            for indexes in pending.values():
+                for index in indexes:
+                    failures[index] = str(exc)
+        else:
+            docs = nlp.pipe(pending, batch_size=batch_size, n_process=n_process)
+            for (cleaned, indexes), doc in zip(pending.items(), docs):
+                text = _join_lemmas(doc)
+                for index in indexes:
+                    results[index] = text
+                    _NORMALIZE_MEMO.set((raw_texts[index], True), text)
+
+    if errors is not None:
+        errors[:] = failures
+    return results
@@ -1,16 +1,29 @@
 from __future__ import annotations
 
-import math
-import re
-from dataclasses import dataclass
-from datetime import UTC, datetime
-from typing import List, Optional
+import base64
+import hashlib
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from .db import get_connection
-from .embeddings import embed_text
+from .embeddings import embed_text, embed_texts
 from .errors import DatabaseError, EmbeddingError, NormalizationError
-from .settings import get_settings
-from .text_normalization import normalize_text
+from .metrics import timed
+from .ranking import (
+    MIN_FINAL_SCORE,
+    RECENCY_DECAY_DAYS,
+    RankWeights,
+    rerank,
+    vibe_terms,
+)
+from .settings import SEARCH_MODES, get_settings
+from .storage import compact_enabled, compact_expression
+from .text_normalization import normalize_text, normalize_texts
 
 
 @dataclass
@@ -21,6 +34,19 @@ class Vibe:
     embedding_model: str
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
+    embedding: Optional[List[float]] = None
+
+    def to_dict(self) -> dict:
+        payload = asdict(self)
+        if self.embedding is None:
+            del payload["embedding"]
+        return payload
+
+
+@dataclass
+class VibePage:
+    items: List[Vibe]
+    next_cursor: Optional[str] = None
 
 
 @dataclass
@@ -48,66 +74,253 @@ class SearchResult:
             f"recency {self.recency_decay:.3f})"
         )
 
-_OVERLAP_STOPWORDS = {
-    "i",
-    "want",
-    "to",
-    "like",
-    "would",
-    "some",
-    "any",
-    "the",
-    "a",
-    "an",
-    "language",
-    "speak",
-    "play",
-    "learn",
-    "practice",
-}
-_TOKEN_RE = re.compile(r"[a-z0-9']+")
-_MIN_FINAL_SCORE = 0.35
-
-
-def _tokenize_for_overlap(text: str) -> List[str]:
-    return _TOKEN_RE.findall(text.lower())
-
-
-def _lexical_overlap_score(query: str, document: str) -> tuple[float, List[str]]:
-    query_terms = {
-        term
-        for term in _tokenize_for_overlap(query)
-        if term and term not in _OVERLAP_STOPWORDS
-    }
-    if not query_terms:
-        return 0.0, []
+    def to_dict(self) -> dict:
+        return {
+            "uid": self.uid,
+            "vibe": self.original_vibe,
+            "score": round(self.final_score, 4),
+            "similarity": round(self.similarity, 4),
+            "lexical_overlap": round(self.lexical_overlap, 4),
+            "recency": round(self.recency_decay, 4),
+            "overlap_terms": self.overlap_terms,
+        }
 
-    doc_terms = {
-        term
-        for term in _tokenize_for_overlap(document)
-        if term and term not in _OVERLAP_STOPWORDS
+
+@dataclass
+class BulkUpsertResult:
+    upserted: int = 0
+    unchanged: int = 0
+    skipped: List[Tuple[str, str]] = field(default_factory=list)
+
+
+_UPSERT_SQL = """
+INSERT INTO vibes (uid, original_vibe, vibe, embedding, embedding_model, vibe_terms)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON CONFLICT (uid) DO UPDATE
+SET original_vibe = EXCLUDED.original_vibe,
+    vibe = EXCLUDED.vibe,
+    embedding = EXCLUDED.embedding,
+    embedding_model = EXCLUDED.embedding_model,
+    vibe_terms = EXCLUDED.vibe_terms,
+    updated_at = NOW();
+"""
+# content_hash is md5(original_vibe), set by a trigger on write and NULL for
+# rows not rewritten since the column was added; matching it and the model
+# means the stored embedding is still current.
+_UNCHANGED_SQL = """
+SELECT uid, COALESCE(content_hash, md5(original_vibe))
+FROM vibes
+WHERE uid = ANY(%s) AND embedding_model = %s;
+"""
+_VIBE_COLUMNS = "uid, original_vibe, vibe, embedding_model, created_at, updated_at"
+_FETCH_SQL = f"SELECT {_VIBE_COLUMNS} FROM vibes WHERE uid = %s;"
+_LIST_SQL = f"SELECT {_VIBE_COLUMNS} FROM vibes ORDER BY updated_at DESC, uid DESC LIMIT %s;"
+# Keyset pages walk vibes_updated_at_uid_idx; the row comparison matches its
+# (updated_at DESC, uid DESC) order so each page is a single index range scan.
+_PAGE_AFTER_SQL = f"""
+SELECT {_VIBE_COLUMNS}
+FROM vibes
+WHERE (updated_at, uid) < (%s, %s)
+ORDER BY updated_at DESC, uid DESC
+LIMIT %s;
+"""
+_EXPORT_SQL = f"SELECT {_VIBE_COLUMNS} FROM vibes ORDER BY uid;"
+_EXPORT_WITH_EMBEDDINGS_SQL = f"SELECT {_VIBE_COLUMNS}, embedding FROM vibes ORDER BY uid;"
+# Case-insensitive, as `manage_vibes.py list-uids` has always printed them.
+_UIDS_SQL = "SELECT uid FROM vibes ORDER BY lower(uid), uid;"
+# Search templates take the ANN ordering and the reported distance, which
+# differ when the coarse pass runs on the compact column (see app.storage),
+# plus the optional filter to rows embedded with the active model.
+_SEARCH_TEMPLATE = """
+SELECT uid,
+       original_vibe,
+       vibe,
+       embedding_model,
+       {distance} AS distance,
+       updated_at,
+       created_at,
+       vibe_terms
+FROM vibes
+{where}
+ORDER BY {ann}
+LIMIT %(pool)s;
+"""
+# Hybrid mode: union ANN and term-overlap candidates and score them with the
+# same weighted formula as app.ranking, entirely server-side.
+_HYBRID_SEARCH_TEMPLATE = """
+WITH ann AS (
+    SELECT uid
+    FROM vibes
+    {where}
+    ORDER BY {ann}
+    LIMIT %(pool)s
+),
+lexical AS (
+    SELECT uid
+    FROM vibes
+    WHERE vibe_terms && %(terms)s::text[]{and_model}
+    ORDER BY cardinality(
+        ARRAY(SELECT unnest(vibe_terms) INTERSECT SELECT unnest(%(terms)s::text[]))
+    ) DESC, updated_at DESC
+    LIMIT %(pool)s
+),
+candidates AS (
+    SELECT uid FROM ann
+    UNION
+    SELECT uid FROM lexical
+),
+components AS (
+    SELECT v.uid,
+           v.original_vibe,
+           v.vibe,
+           v.embedding_model,
+           v.{distance} AS distance,
+           ARRAY(
+               SELECT unnest(v.vibe_terms) INTERSECT SELECT unnest(%(terms)s::text[]) ORDER BY 1
+           ) AS overlap_terms,
+           EXP(
+               -GREATEST(
+                   EXTRACT(EPOCH FROM NOW() - COALESCE(v.updated_at, v.created_at)) / 86400.0,
+                   0
+               ) / %(decay_days)s
+           ) AS recency
+    FROM candidates
+    JOIN vibes v USING (uid)
+),
+scored AS (
+    SELECT *,
+           CASE WHEN %(term_count)s = 0 THEN 0.0
+                ELSE cardinality(overlap_terms)::float8 / %(term_count)s
+           END AS lexical
+    FROM components
+),
+ranked AS (
+    SELECT *,
+           %(w_similarity)s * GREATEST(1.0 - distance, 0.0)
+           + %(w_lexical)s * lexical
+           + %(w_recency)s * recency AS final_score
+    FROM scored
+)
+SELECT uid, original_vibe, vibe, embedding_model, distance, lexical, recency, final_score, overlap_terms
+FROM ranked
+WHERE final_score >= %(min_score)s
+ORDER BY final_score DESC
+LIMIT %(top_k)s;
+"""
+# The same-model predicate always filters the LATERAL scans, so enable
+# pgvector 0.8+'s iterative scans for the transaction; older versions reject
+# the GUCs, hence the version check.
+_SIMILAR_ITERATIVE_SCAN_SQL = """
+SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true),
+       set_config('ivfflat.iterative_scan', 'relaxed_order', true)
+FROM pg_extension
+WHERE extname = 'vector'
+  AND string_to_array(split_part(extversion, '-', 1), '.')::int[] >= ARRAY[0, 8];
+"""
+# Neighbours of stored vibes, one LATERAL ANN scan per source row; only rows
+# embedded with the source's model are comparable.
+_SIMILAR_TEMPLATE = """
+SELECT s.uid AS source_uid,
+       s.original_vibe AS source_vibe,
+       n.uid,
+       n.original_vibe,
+       n.vibe,
+       n.embedding_model,
+       n.distance,
+       n.updated_at,
+       n.created_at,
+       n.vibe_terms
+FROM vibes s
+LEFT JOIN LATERAL (
+    SELECT v.uid,
+           v.original_vibe,
+           v.vibe,
+           v.embedding_model,
+           {distance} AS distance,
+           v.updated_at,
+           v.created_at,
+           v.vibe_terms
+    FROM vibes v
+    WHERE v.uid <> s.uid AND v.embedding_model = s.embedding_model
+    ORDER BY {ann}
+    LIMIT %(pool)s
+) n ON TRUE
+WHERE s.uid = ANY(%(uids)s);
+"""
+_WIPE_SQL = "DELETE FROM vibes;"
+_BACKFILL_TERMS_SELECT_SQL = """
+SELECT uid, original_vibe
+FROM vibes
+WHERE vibe_terms = '{}' AND uid > %s
+ORDER BY uid
+LIMIT %s;
+"""
+_BACKFILL_TERMS_UPDATE_SQL = "UPDATE vibes SET vibe_terms = %s WHERE uid = %s;"
+_STALE_COUNT_SQL = "SELECT COUNT(*) FROM vibes WHERE embedding_model <> %s;"
+_STALE_SELECT_SQL = """
+SELECT uid, original_vibe
+FROM vibes
+WHERE embedding_model <> %s AND uid > %s
+ORDER BY uid
+LIMIT %s;
+"""
+# Matching on the original text skips rows edited while the batch was being
+# embedded; those were already written with the active model.
+_REEMBED_UPDATE_SQL = """
+UPDATE vibes
+SET vibe = %s, embedding = %s, embedding_model = %s
+WHERE uid = %s AND original_vibe = %s;
+"""
+_upserts_written = 0
+_upserts_unchanged = 0
+
+
+def content_hash(original_vibe: str) -> str:
+    """Python side of the trigger-maintained ``vibes.content_hash`` column."""
+    return hashlib.md5(original_vibe.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+def _unchanged_records(
+    rows, records: Iterable[Tuple[str, str]]
+) -> Set[Tuple[str, str]]:
+    """``(uid, original_vibe)`` pairs whose stored hash (from ``_UNCHANGED_SQL``) matches."""
+    stored = dict(rows)
+    return {
+        (uid, original_vibe)
+        for uid, original_vibe in records
+        if uid in stored and stored[uid] == content_hash(original_vibe)
     }
-    if not doc_terms:
-        return 0.0, []
 
-    overlap = sorted(query_terms.intersection(doc_terms))
-    return len(overlap) / len(query_terms), overlap
+
+def _record_upserts(*, written: int = 0, unchanged: int = 0) -> None:
+    global _upserts_written, _upserts_unchanged
+    _upserts_written += written
+    _upserts_unchanged += unchanged
 
 
-def _recency_decay(updated_at: Optional[datetime], created_at: Optional[datetime]) -> float:
-    reference = updated_at or created_at
-    if reference is None:
-        return 0.0
+def upsert_stats() -> dict:
+    return {"written": _upserts_written, "unchanged": _upserts_unchanged}
 
-    now = datetime.now(UTC)
-    age = now - reference
-    age_days = max(age.total_seconds() / 86400.0, 0.0)
-    score = math.exp(-age_days / 60.0)
-    return max(0.0, min(score, 1.0))
 
+def upsert_vibe(uid: str, vibe: str) -> bool:
+    """Store ``vibe`` for ``uid``; returns ``False`` if it was already stored as-is.
 
-def upsert_vibe(uid: str, vibe: str) -> None:
+    Resubmitting identical text for the active model skips normalization,
+    the embedding request and the row rewrite.
+    """
     settings = get_settings()
+    original_vibe = vibe.strip()
+
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(_UNCHANGED_SQL, ([uid], settings.active_embedding_model))
+            unchanged = _unchanged_records(cur.fetchall(), [(uid, original_vibe)])
+    except Exception as exc:  # pragma: no cover - DB errors
+        raise DatabaseError(f"Failed to upsert vibe: {exc}") from exc
+
+    if unchanged:
+        _record_upserts(unchanged=1)
+        return False
 
     try:
         processed_vibe = normalize_text(vibe)
@@ -115,27 +328,18 @@ def upsert_vibe(uid: str, vibe: str) -> None:
         raise EmbeddingError(str(exc)) from exc
 
     embedding = embed_text(processed_vibe, already_normalized=True)
-    original_vibe = vibe.strip()
 
     try:
         with get_connection() as conn, conn.cursor() as cur:
             cur.execute(
-                """
-                INSERT INTO vibes (uid, original_vibe, vibe, embedding, embedding_model)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (uid) DO UPDATE
-                SET original_vibe = EXCLUDED.original_vibe,
-                    vibe = EXCLUDED.vibe,
-                embedding = EXCLUDED.embedding,
-                    embedding_model = EXCLUDED.embedding_model,
-                    updated_at = NOW();
-                """,
+                _UPSERT_SQL,
                 (
                     uid,
                     original_vibe,
                     processed_vibe,
                     embedding,
-                    settings.embedding_model,
+                    settings.active_embedding_model,
+                    vibe_terms(original_vibe),
                 ),
             )
     except EmbeddingError:
@@ -143,25 +347,89 @@ def upsert_vibe(uid: str, vibe: str) -> None:
     except Exception as exc:  # pragma: no cover - DB errors
         raise DatabaseError(f"Failed to upsert vibe: {exc}") from exc
 
+    _record_upserts(written=1)
+    return True
 
-def fetch_vibe(uid: str) -> Optional[Vibe]:
-    try:
-        with get_connection() as conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT uid, original_vibe, vibe, embedding_model, created_at, updated_at
-                FROM vibes
-                WHERE uid = %s;
-                """,
-                (uid,),
+
+def _chunked(records: Iterable[Tuple[str, str]], size: int) -> Iterator[List[Tuple[str, str]]]:
+    iterator = iter(records)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def bulk_upsert_vibes(
+    records: Iterable[Tuple[str, str]], *, batch_size: Optional[int] = None
+) -> BulkUpsertResult:
+    """Upsert many ``(uid, vibe)`` pairs, embedding and writing them in batches.
+
+    Records are consumed lazily so arbitrarily large imports run in bounded
+    memory. Vibes that fail normalization are reported in ``skipped`` instead
+    of aborting the whole import; vibes already stored with the same text and
+    model are counted in ``unchanged`` and not re-embedded.
+    """
+    settings = get_settings()
+    batch_size = batch_size or settings.embedding_batch_size
+    result = BulkUpsertResult()
+
+    for batch in _chunked(records, batch_size):
+        try:
+            with get_connection() as conn, conn.cursor() as cur:
+                cur.execute(
+                    _UNCHANGED_SQL,
+                    ([uid for uid, _ in batch], settings.active_embedding_model),
+                )
+                unchanged = _unchanged_records(
+                    cur.fetchall(), [(uid, vibe.strip()) for uid, vibe in batch]
+                )
+        except Exception as exc:  # pragma: no cover - DB errors
+            raise DatabaseError(f"Failed to bulk upsert vibes: {exc}") from exc
+
+        if unchanged:
+            remaining = [(uid, vibe) for uid, vibe in batch if (uid, vibe.strip()) not in unchanged]
+            result.unchanged += len(batch) - len(remaining)
+            _record_upserts(unchanged=len(batch) - len(remaining))
+            batch = remaining
+        if not batch:
+            continue
+
+        errors: List[Optional[str]] = []
+        processed = normalize_texts([vibe for _, vibe in batch], strict=False, errors=errors)
+        prepared: List[Tuple[str, str, str]] = []
+        for (uid, vibe), processed_vibe, error in zip(batch, processed, errors):
+            if processed_vibe is None:
+                result.skipped.append((uid, error or "Vibe text is empty after normalization."))
+            else:
+                prepared.append((uid, vibe.strip(), processed_vibe))
+
+        if not prepared:
+            continue
+
+        embeddings = embed_texts([processed for _, _, processed in prepared], already_normalized=True)
+        params = [
+            (
+                uid,
+                original_vibe,
+                processed_vibe,
+                embedding,
+                settings.active_embedding_model,
+                vibe_terms(original_vibe),
             )
-            row = cur.fetchone()
-    except Exception as exc:  # pragma: no cover
-        raise DatabaseError(f"Failed to fetch vibe: {exc}") from exc
+            for (uid, original_vibe, processed_vibe), embedding in zip(prepared, embeddings)
+        ]
+
+        try:
+            with get_connection() as conn, conn.transaction(), conn.cursor() as cur:
+                cur.executemany(_UPSERT_SQL, params)
+        except Exception as exc:  # pragma: no cover - DB errors
+            raise DatabaseError(f"Failed to bulk upsert vibes: {exc}") from exc
+
+        result.upserted += len(params)
+        _record_upserts(written=len(params))
+
+    return result
 
-    if not row:
-        return None
 
+def _row_to_vibe(row) -> Vibe:
     return Vibe(
         uid=row[0],
         original_vibe=row[1],
@@ -169,93 +437,455 @@ def fetch_vibe(uid: str) -> Optional[Vibe]:
         embedding_model=row[3],
         created_at=row[4].isoformat() if row[4] else None,
         updated_at=row[5].isoformat() if row[5] else None,
+        embedding=row[6].tolist() if len(row) > 6 else None,
     )
 
 
-def list_vibes(limit: int = 20) -> List[Vibe]:
+def encode_cursor(record: Vibe) -> str:
+    """Opaque cursor pointing just past ``record`` in ``(updated_at, uid)`` order."""
+    payload = json.dumps([record.updated_at, record.uid], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
     try:
-        with get_connection() as conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT uid, original_vibe, vibe, embedding_model, created_at, updated_at
-                FROM vibes
-                ORDER BY updated_at DESC
-                LIMIT %s;
-                """,
-                (limit,),
-            )
-            rows = cur.fetchall()
-    except Exception as exc:  # pragma: no cover
-        raise DatabaseError(f"Failed to list vibes: {exc}") from exc
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, uid = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(updated_at), str(uid)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid pagination cursor.") from exc
+
+
+def _page_statement(limit: int, cursor: Optional[str]):
+    """``(sql, params)`` fetching one extra row to detect a following page."""
+    if cursor is None:
+        return _LIST_SQL, (limit + 1,)
+    updated_at, uid = decode_cursor(cursor)
+    return _PAGE_AFTER_SQL, (updated_at, uid, limit + 1)
+
+
+def _to_page(rows, limit: int) -> VibePage:
+    items = [_row_to_vibe(row) for row in rows[:limit]]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    return VibePage(items=items, next_cursor=next_cursor)
+
+
+# Upper bound pgvector accepts for hnsw.ef_search.
+_MAX_EF_SEARCH = 1000
+
+
+def _candidate_pool(top_k: int) -> int:
+    return max(top_k, top_k * get_settings().search_candidate_multiplier)
+
+
+@lru_cache(maxsize=1)
+def _search_sql() -> Tuple[str, str]:
+    """``(rerank_sql, hybrid_sql)`` for the configured ``EMBEDDING_STORAGE``."""
+    settings = get_settings()
+    full = "embedding <=> %(embedding)s::vector"
+    ann = distance = full
+    if compact_enabled():
+        ann = "embedding_compact <=> " + compact_expression(
+            "%(embedding)s::vector", settings.compact_embedding_dimension
+        )
+        distance = full if settings.compact_rescore else ann
+    model_filter = "embedding_model = %(model)s" if settings.search_model_filter else ""
+    where = f"WHERE {model_filter}" if model_filter else ""
+    and_model = f" AND {model_filter}" if model_filter else ""
+    return (
+        _SEARCH_TEMPLATE.format(ann=ann, distance=distance, where=where),
+        _HYBRID_SEARCH_TEMPLATE.format(
+            ann=ann, distance=distance, where=where, and_model=and_model
+        ),
+    )
 
+
+@lru_cache(maxsize=1)
+def _similar_sql() -> str:
+    full = "v.embedding <=> s.embedding"
+    ann = distance = full
+    if compact_enabled():
+        ann = "v.embedding_compact <=> s.embedding_compact"
+        distance = full if get_settings().compact_rescore else ann
+    return _SIMILAR_TEMPLATE.format(ann=ann, distance=distance)
+
+
+def _similar_results(rows, uids: Iterable[str], top_k: int) -> Dict[str, List[SearchResult]]:
+    """Group ``_SIMILAR_TEMPLATE`` rows by source and re-rank each group
+    against the source's own text. Unknown uids are absent from the result."""
+    grouped: Dict[str, Tuple[str, list]] = {}
+    for row in rows:
+        _, neighbours = grouped.setdefault(row[0], (row[1], []))
+        if row[2] is not None:  # LEFT JOIN row for a source without neighbours
+            neighbours.append(row[2:])
+
+    return {
+        uid: _score_rows(grouped[uid][0], grouped[uid][1], top_k)
+        for uid in dict.fromkeys(uids)
+        if uid in grouped
+    }
+
+
+@timed("rerank")
+def _score_rows(
+    query: str, rows, top_k: int, weights: Optional[RankWeights] = None
+) -> List[SearchResult]:
+    ranked = rerank(
+        query,
+        [row[1] for row in rows],
+        [row[4] for row in rows],
+        [row[5] or row[6] for row in rows],
+        top_k,
+        document_terms=[row[7] for row in rows],
+        weights=weights,
+    )
     return [
-        Vibe(
+        SearchResult(
+            uid=rows[candidate.index][0],
+            original_vibe=rows[candidate.index][1],
+            processed_vibe=rows[candidate.index][2],
+            embedding_model=rows[candidate.index][3],
+            distance=candidate.distance,
+            lexical_overlap=candidate.lexical_overlap,
+            recency_decay=candidate.recency_decay,
+            final_score=candidate.final_score,
+            overlap_terms=candidate.overlap_terms,
+        )
+        for candidate in ranked
+    ]
+
+
+def _resolve_search_mode(mode: Optional[str]) -> str:
+    """``mode`` or ``SEARCH_MODE``; checked before any embedding work is done."""
+    mode = mode or get_settings().search_mode
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'; expected 'rerank' or 'hybrid'.")
+    return mode
+
+
+def _search_statement(
+    query: str,
+    embedding,
+    top_k: int,
+    mode: str,
+    weights: Optional[RankWeights],
+):
+    """Return ``(sql, params)`` for a mode resolved by :func:`_resolve_search_mode`."""
+    settings = get_settings()
+    rerank_sql, hybrid_sql = _search_sql()
+    if mode == "rerank":
+        return rerank_sql, {
+            "embedding": embedding,
+            "model": settings.active_embedding_model,
+            "pool": _candidate_pool(top_k),
+        }
+    weights = weights or RankWeights.from_settings()
+    terms = vibe_terms(query)
+    return hybrid_sql, {
+        "embedding": embedding,
+        "model": settings.active_embedding_model,
+        "terms": terms,
+        "term_count": len(terms),
+        "pool": _candidate_pool(top_k),
+        "decay_days": RECENCY_DECAY_DAYS,
+        "w_similarity": weights.similarity,
+        "w_lexical": weights.lexical,
+        "w_recency": weights.recency,
+        "min_score": MIN_FINAL_SCORE,
+        "top_k": top_k,
+    }
+
+
+def _search_tuning(probes: Optional[int], ef_search: Optional[int], pool: int):
+    """Transaction-local index knob settings for one search as ``(sql, params)``.
+
+    HNSW returns at most ``hnsw.ef_search`` rows, so the effective value is
+    raised to the candidate ``pool`` (capped at pgvector's 1000) whether it
+    comes from ``ef_search`` or from the session default.
+    """
+    floor = min(pool, _MAX_EF_SEARCH)
+    if ef_search:
+        clauses = ["set_config('hnsw.ef_search', %s, true)"]
+        params: List[object] = [str(min(max(ef_search, floor), _MAX_EF_SEARCH))]
+    else:
+        clauses = [
+            "set_config('hnsw.ef_search', GREATEST("
+            "COALESCE(NULLIF(current_setting('hnsw.ef_search', true), ''), '0')::int, %s"
+            ")::text, true)"
+        ]
+        params = [floor]
+    if probes:
+        clauses.append("set_config('ivfflat.probes', %s, true)")
+        params.append(str(probes))
+    return "SELECT " + ", ".join(clauses) + ";", params
+
+
+def _search_results(
+    query: str,
+    rows,
+    top_k: int,
+    mode: str,
+    weights: Optional[RankWeights],
+) -> List[SearchResult]:
+    if mode == "rerank":
+        return _score_rows(query, rows, top_k, weights)
+
+    return [
+        SearchResult(
             uid=row[0],
             original_vibe=row[1],
             processed_vibe=row[2],
             embedding_model=row[3],
-            created_at=row[4].isoformat() if row[4] else None,
-            updated_at=row[5].isoformat() if row[5] else None,
+            distance=float(row[4]),
+            lexical_overlap=float(row[5]),
+            recency_decay=float(row[6]),
+            final_score=float(row[7]),
+            overlap_terms=list(row[8]),
         )
         for row in rows
     ]
 
 
-def search_vibes(query: str, top_k: int = 5) -> List[SearchResult]:
-    embedding = embed_text(query)
+def fetch_vibe(uid: str) -> Optional[Vibe]:
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(_FETCH_SQL, (uid,))
+            row = cur.fetchone()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to fetch vibe: {exc}") from exc
 
+    if not row:
+        return None
+
+    return _row_to_vibe(row)
+
+
+def list_vibes(limit: int = 20) -> List[Vibe]:
     try:
         with get_connection() as conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT uid,
-                       original_vibe,
-                       vibe,
-                       embedding_model,
-                       embedding <=> %s::vector AS distance,
-                       updated_at,
-                       created_at
-                FROM vibes
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s;
-                """,
-                (embedding, embedding, top_k),
-            )
+            cur.execute(_LIST_SQL, (limit,))
+            rows = cur.fetchall()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to list vibes: {exc}") from exc
+
+    return [_row_to_vibe(row) for row in rows]
+
+
+def list_vibes_page(limit: int = 20, cursor: Optional[str] = None) -> VibePage:
+    """Return one page of vibes, most recently updated first.
+
+    Pass the previous page's ``next_cursor`` to continue; it is ``None`` on
+    the last page. Raises ``ValueError`` for a malformed cursor.
+    """
+    statement, params = _page_statement(limit, cursor)
+    try:
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute(statement, params)
+            rows = cur.fetchall()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to list vibes: {exc}") from exc
+
+    return _to_page(rows, limit)
+
+
+def iter_vibes(*, include_embeddings: bool = False, batch_size: int = 1000) -> Iterator[Vibe]:
+    """Stream every vibe in uid order through a server-side cursor.
+
+    Rows are fetched ``batch_size`` at a time, so memory stays constant
+    regardless of table size. The connection is held until the iterator is
+    exhausted or closed.
+    """
+    statement = _EXPORT_WITH_EMBEDDINGS_SQL if include_embeddings else _EXPORT_SQL
+    try:
+        with get_connection() as conn, conn.transaction():
+            with conn.cursor(name="vibes_export") as cur:
+                cur.itersize = batch_size
+                cur.execute(statement)
+                for row in cur:
+                    yield _row_to_vibe(row)
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to stream vibes: {exc}") from exc
+
+
+def iter_uids(*, batch_size: int = 1000) -> Iterator[str]:
+    """Stream every uid, ordered case-insensitively, through a server-side cursor."""
+    try:
+        with get_connection() as conn, conn.transaction():
+            with conn.cursor(name="vibes_uids") as cur:
+                cur.itersize = batch_size
+                cur.execute(_UIDS_SQL)
+                for (uid,) in cur:
+                    yield uid
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to list uids: {exc}") from exc
+
+
+def find_similar_many(
+    uids: Iterable[str], top_k: int = 5
+) -> Dict[str, List[SearchResult]]:
+    """Top-``top_k`` neighbours for each of ``uids`` in a single query.
+
+    Uses the stored embeddings, so no normalization or embedding calls are
+    made; each source is re-ranked against its own text and never matches
+    itself. Unknown uids are omitted from the result.
+    """
+    uids = list(uids)
+    if not uids:
+        return {}
+
+    pool = _candidate_pool(top_k)
+    try:
+        with get_connection() as conn, conn.transaction(), conn.cursor() as cur:
+            cur.execute(*_search_tuning(None, None, pool))
+            cur.execute(_SIMILAR_ITERATIVE_SCAN_SQL)
+            cur.execute(_similar_sql(), {"uids": uids, "pool": pool})
             rows = cur.fetchall()
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to find similar vibes: {exc}") from exc
+
+    return _similar_results(rows, uids, top_k)
+
+
+def find_similar(uid: str, top_k: int = 5) -> Optional[List[SearchResult]]:
+    """Vibes most similar to the one stored for ``uid``; ``None`` if it is unknown."""
+    return find_similar_many([uid], top_k).get(uid)
+
+
+def search_vibes(
+    query: str,
+    top_k: int = 5,
+    *,
+    mode: Optional[str] = None,
+    weights: Optional[RankWeights] = None,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[SearchResult]:
+    """Return the best ``top_k`` matches for ``query``.
+
+    ``mode="rerank"`` re-ranks a widened ANN candidate pool in Python;
+    ``mode="hybrid"`` merges ANN and term-overlap candidates and scores them
+    in a single SQL round trip. Defaults to ``SEARCH_MODE``. ``probes`` and
+    ``ef_search`` override the ivfflat/HNSW search breadth for this query only.
+    """
+    mode = _resolve_search_mode(mode)
+    embedding = embed_text(query)
+    statement, params = _search_statement(query, embedding, top_k, mode, weights)
+    tuning = _search_tuning(probes, ef_search, _candidate_pool(top_k))
+
+    try:
+        with get_connection() as conn, conn.transaction(), conn.cursor() as cur:
+            cur.execute(*tuning)
+            with timed("ann_query"):
+                cur.execute(statement, params)
+                rows = cur.fetchall()
     except EmbeddingError:
         raise
     except Exception as exc:  # pragma: no cover
         raise DatabaseError(f"Failed to search vibes: {exc}") from exc
 
-    scored_results: List[SearchResult] = []
-    for row in rows:
-        distance = float(row[4])
-        similarity = max(0.0, 1.0 - distance)
-        lexical, overlap_terms = _lexical_overlap_score(query, row[1])
-        recency = _recency_decay(row[5], row[6])
-        final_score = (0.80 * similarity) + (0.15 * lexical) + (0.05 * recency)
-        scored_results.append(
-            SearchResult(
-                uid=row[0],
-                original_vibe=row[1],
-                processed_vibe=row[2],
-                embedding_model=row[3],
-                distance=distance,
-                lexical_overlap=lexical,
-                recency_decay=recency,
-                final_score=final_score,
-                overlap_terms=overlap_terms,
-            )
-        )
+    return _search_results(query, rows, top_k, mode, weights)
+
+
+def backfill_vibe_terms(batch_size: int = 1000) -> int:
+    """Populate ``vibe_terms`` for rows written before the column existed.
+
+    Rows are walked in keyset order by uid so the job can be interrupted and
+    re-run; returns the number of rows updated.
+    """
+    updated = 0
+    last_uid = ""
+    try:
+        with get_connection() as conn:
+            while True:
+                with conn.cursor() as cur:
+                    cur.execute(_BACKFILL_TERMS_SELECT_SQL, (last_uid, batch_size))
+                    rows = cur.fetchall()
+                if not rows:
+                    break
+
+                params = [(vibe_terms(original_vibe), uid) for uid, original_vibe in rows]
+                with conn.transaction(), conn.cursor() as cur:
+                    cur.executemany(_BACKFILL_TERMS_UPDATE_SQL, params)
+                updated += len(rows)
+                last_uid = rows[-1][0]
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to backfill vibe terms: {exc}") from exc
+
+    return updated
+
+
+def reembed_vibes(
+    *,
+    batch_size: Optional[int] = None,
+    rows_per_minute: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """Re-embed rows whose ``embedding_model`` differs from the active model.
+
+    Rows are walked in keyset order by uid, one committed batch at a time, so
+    the job never locks the table and can be interrupted and re-run.
+    ``rows_per_minute`` paces the embedding calls; ``progress`` receives
+    ``(done, total)`` after each batch. Rows whose ``original_vibe`` no longer
+    normalizes are left on their old model. Returns the number of rows updated.
+    """
+    settings = get_settings()
+    model = settings.active_embedding_model
+    batch_size = batch_size or settings.embedding_batch_size
+
+    updated = 0
+    last_uid = ""
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(_STALE_COUNT_SQL, (model,))
+                total = int(cur.fetchone()[0])
+
+            while True:
+                started = time.monotonic()
+                with conn.cursor() as cur:
+                    cur.execute(_STALE_SELECT_SQL, (model, last_uid, batch_size))
+                    rows = cur.fetchall()
+                if not rows:
+                    break
+
+                # Re-normalize from the source text: the stored ``vibe`` may
+                # predate the current normalization rules.
+                processed = normalize_texts([original for _, original in rows], strict=False)
+                prepared = [
+                    (uid, original, vibe)
+                    for (uid, original), vibe in zip(rows, processed)
+                    if vibe is not None
+                ]
+                last_uid = rows[-1][0]
+                if prepared:
+                    embeddings = embed_texts(
+                        [vibe for _, _, vibe in prepared], already_normalized=True
+                    )
+                    params = [
+                        (vibe, embedding, model, uid, original)
+                        for (uid, original, vibe), embedding in zip(prepared, embeddings)
+                    ]
+                    with conn.transaction(), conn.cursor() as cur:
+                        cur.executemany(_REEMBED_UPDATE_SQL, params)
+                    updated += len(prepared)
+                if progress:
+                    progress(updated, total)
+
+                if rows_per_minute:
+                    pause = len(rows) * 60.0 / rows_per_minute - (time.monotonic() - started)
+                    if pause > 0:
+                        time.sleep(pause)
+    except EmbeddingError:
+        raise
+    except Exception as exc:  # pragma: no cover
+        raise DatabaseError(f"Failed to re-embed vibes: {exc}") from exc
 
-    scored_results.sort(key=lambda item: item.final_score, reverse=True)
-    filtered_results = [item for item in scored_results if item.final_score >= _MIN_FINAL_SCORE]
-    return filtered_results[:top_k]
+    return updated
 
 
 def wipe_vibes() -> None:
     try:
         with get_connection() as conn, conn.cursor() as cur:
-            cur.execute("DELETE FROM vibes;")
+            cur.execute(_WIPE_SQL)
     except Exception as exc:  # pragma: no cover
         raise DatabaseError(f"Failed to wipe vibes table: {exc}") from exc
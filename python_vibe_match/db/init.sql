@@ -6,18 +6,38 @@ CREATE TABLE IF NOT EXISTS vibes (
     vibe TEXT NOT NULL,
     embedding VECTOR(1536) NOT NULL,
     embedding_model TEXT NOT NULL,
+    vibe_terms TEXT[] NOT NULL DEFAULT '{}',
+    content_hash TEXT,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- HNSW builds correctly on an empty table; use `manage_vibes.py index` to
+-- switch strategy or re-tune once the table has data.
 CREATE INDEX IF NOT EXISTS vibes_embedding_idx
-    ON vibes USING ivfflat (embedding vector_cosine_ops)
-    WITH (lists = 100);
+    ON vibes USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS vibes_terms_idx
+    ON vibes USING gin (vibe_terms);
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    cache_key TEXT PRIMARY KEY,
+    embedding_model TEXT NOT NULL,
+    dimension INTEGER NOT NULL,
+    embedding BYTEA NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
 
 CREATE OR REPLACE FUNCTION set_updated_at()
 RETURNS TRIGGER AS $$
 BEGIN
-    NEW.updated_at = NOW();
+    -- Derived-column maintenance (e.g. backfilling vibe_terms) must not make
+    -- rows look freshly edited, so only bump when the vibe text changes.
+    IF NEW.original_vibe IS DISTINCT FROM OLD.original_vibe
+       OR NEW.vibe IS DISTINCT FROM OLD.vibe THEN
+        NEW.updated_at = NOW();
+    END IF;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -28,3 +48,18 @@ CREATE TRIGGER vibes_set_updated_at
 BEFORE UPDATE ON vibes
 FOR EACH ROW
 EXECUTE PROCEDURE set_updated_at();
+
+CREATE OR REPLACE FUNCTION set_content_hash()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.content_hash = md5(NEW.original_vibe);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vibes_set_content_hash ON vibes;
+
+CREATE TRIGGER vibes_set_content_hash
+BEFORE INSERT OR UPDATE OF original_vibe ON vibes
+FOR EACH ROW
+EXECUTE PROCEDURE set_content_hash();
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import csv
+import json
 import sys
 from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
 
 import typer
 
@@ -10,23 +13,99 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from app import vibes
+from app import benchmark, indexing, match_graph, migrations, storage, vibes
+from app import export as export_module
 from app.errors import DatabaseError, EmbeddingError
 
 app = typer.Typer(help="Manage vibes stored in PostgreSQL with pgvector embeddings.")
 
 
+@app.command()
+def migrate(
+    target: int = typer.Option(None, min=1, help="Stop after this version; defaults to the latest."),
+    status: bool = typer.Option(False, "--status", help="Only print the current and latest version."),
+) -> None:
+    """Apply pending schema migrations."""
+    try:
+        if status:
+            typer.echo(
+                f"Schema version {migrations.current_version()} "
+                f"(latest {migrations.latest_version()})."
+            )
+            return
+
+        applied = migrations.migrate(
+            target,
+            progress=lambda step: typer.echo(f"Applying {step.version}: {step.name}..."),
+        )
+    except DatabaseError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+
+    if not applied:
+        typer.echo("Schema is up to date.")
+    else:
+        typer.echo(f"Applied {len(applied)} migrations; schema version {applied[-1].version}.")
+
+
 @app.command()
 def upsert(uid: str, vibe: str) -> None:
     """Insert or replace a vibe associated with a uid."""
     try:
-        vibes.upsert_vibe(uid, vibe)
+        written = vibes.upsert_vibe(uid, vibe)
     except EmbeddingError as exc:
         raise typer.BadParameter(str(exc)) from exc
     except DatabaseError as exc:
         raise typer.Exit(code=1) from exc
 
-    typer.echo(f"Stored vibe for '{uid}'.")
+    typer.echo(f"Stored vibe for '{uid}'." if written else f"Vibe for '{uid}' is unchanged.")
+
+
+def _read_records(path: Path, fmt: str, uid_field: str, vibe_field: str) -> Iterator[Tuple[str, str]]:
+    with path.open(newline="", encoding="utf-8") as handle:
+        if fmt == "csv":
+            rows = csv.DictReader(handle)
+        else:
+            rows = (json.loads(line) for line in handle if line.strip())
+
+        for line_number, row in enumerate(rows, start=1):
+            uid = row.get(uid_field)
+            vibe = row.get(vibe_field)
+            if not uid or not vibe:
+                typer.echo(f"Skipping record {line_number}: missing '{uid_field}' or '{vibe_field}'.", err=True)
+                continue
+            yield str(uid), str(vibe)
+
+
+@app.command("import")
+def import_vibes(
+    path: Path = typer.Argument(..., exists=True, dir_okay=False, readable=True),
+    fmt: str = typer.Option(None, "--format", help="jsonl or csv; inferred from the file suffix by default."),
+    uid_field: str = typer.Option("uid", help="Field holding the uid."),
+    vibe_field: str = typer.Option("vibe", help="Field holding the vibe text."),
+    batch_size: int = typer.Option(None, min=1, max=2048, help="Records embedded per request."),
+) -> None:
+    """Bulk import vibes from a JSONL or CSV file."""
+    fmt = (fmt or path.suffix.lstrip(".")).lower()
+    if fmt in {"json", "ndjson"}:
+        fmt = "jsonl"
+    if fmt not in {"jsonl", "csv"}:
+        raise typer.BadParameter("Format must be 'jsonl' or 'csv'.")
+
+    records = _read_records(path, fmt, uid_field, vibe_field)
+    try:
+        result = vibes.bulk_upsert_vibes(records, batch_size=batch_size)
+    except EmbeddingError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    except DatabaseError as exc:
+        raise typer.Exit(code=1) from exc
+
+    for uid, reason in result.skipped:
+        typer.echo(f"Skipped '{uid}': {reason}", err=True)
+    typer.echo(
+        f"Imported {result.upserted} vibes "
+        f"({result.unchanged} unchanged, {len(result.skipped)} skipped)."
+    )
 
 
 @app.command()
@@ -52,10 +131,20 @@ def fetch(uid: str) -> None:
 
 
 @app.command()
-def search(query: str, top_k: int = typer.Option(5, min=1, max=50)) -> None:
+def search(
+    query: str,
+    top_k: int = typer.Option(5, min=1, max=50),
+    mode: str = typer.Option(None, help="rerank or hybrid; defaults to SEARCH_MODE."),
+    probes: int = typer.Option(None, min=1, help="ivfflat.probes for this query."),
+    ef_search: int = typer.Option(None, min=1, help="hnsw.ef_search for this query."),
+) -> None:
     """Search for similar vibes using cosine distance."""
     try:
-        results = vibes.search_vibes(query, top_k=top_k)
+        results = vibes.search_vibes(
+            query, top_k=top_k, mode=mode, probes=probes, ef_search=ef_search
+        )
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
     except EmbeddingError as exc:
         raise typer.BadParameter(str(exc)) from exc
     except DatabaseError as exc:
@@ -73,20 +162,252 @@ def search(query: str, top_k: int = typer.Option(5, min=1, max=50)) -> None:
         typer.echo(f"   processed: {result.processed_vibe}")
 
 
+@app.command()
+def similar(
+    uids: List[str] = typer.Argument(..., help="One or more uids; several are matched in one query."),
+    top_k: int = typer.Option(5, min=1, max=50),
+) -> None:
+    """Find the vibes closest to already stored ones, without embedding calls."""
+    try:
+        matches = vibes.find_similar_many(uids, top_k)
+    except DatabaseError as exc:
+        raise typer.Exit(code=1) from exc
+
+    for uid in uids:
+        results = matches.get(uid)
+        if results is None:
+            typer.echo(f"No vibe found for uid '{uid}'.", err=True)
+            continue
+
+        typer.echo(f"{uid}:")
+        if not results:
+            typer.echo("   no similar vibes")
+        for idx, result in enumerate(results, start=1):
+            typer.echo(
+                f"   {idx}. uid={result.uid} | similarity={result.similarity:.3f} "
+                f"| score={result.final_score:.3f}"
+            )
+
+
+@app.command()
+def match_graph_refresh(
+    top_k: int = typer.Option(10, min=1, max=100),
+    full: bool = typer.Option(False, "--full", help="Recompute every source, not just affected ones."),
+    block_size: int = typer.Option(1024, min=1, help="Source rows per matrix-product block."),
+    workers: int = typer.Option(None, min=1, help="Threads computing blocks; defaults to the CPU count."),
+) -> None:
+    """Precompute every vibe's top-k matches into the vibe_matches table."""
+    try:
+        result = match_graph.refresh_match_graph(
+            top_k=top_k,
+            full=full,
+            block_size=block_size,
+            workers=workers,
+            progress=lambda done, total: typer.echo(f"Scored {done}/{total} sources...", err=True),
+        )
+    except DatabaseError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+
+    kind = "full" if result.full else "incremental"
+    typer.echo(
+        f"{kind.capitalize()} refresh recomputed {result.refreshed} of {result.sources} "
+        f"sources in {result.seconds:.1f}s."
+    )
+
+
 @app.command()
 def list_uids() -> None:
     """List all stored uids."""
+    found = False
     try:
-        records = vibes.list_vibes(limit=100)
+        for uid in vibes.iter_uids():
+            typer.echo(uid)
+            found = True
     except DatabaseError as exc:
         raise typer.Exit(code=1) from exc
 
-    if not records:
+    if not found:
         typer.echo("No vibes stored.")
+
+
+@app.command()
+def export(
+    path: Path = typer.Argument(..., dir_okay=False, writable=True),
+    fmt: str = typer.Option(None, "--format", help="jsonl or parquet; inferred from the file suffix."),
+    with_embeddings: bool = typer.Option(False, "--with-embeddings", help="Include embedding vectors."),
+    batch_size: int = typer.Option(1000, min=1, help="Rows fetched per server-side cursor round trip."),
+) -> None:
+    """Stream every stored vibe to a JSONL or Parquet file."""
+    fmt = fmt or ("parquet" if path.suffix.lower() == ".parquet" else "jsonl")
+    try:
+        exported = export_module.export_vibes(
+            path,
+            fmt=fmt,
+            include_embeddings=with_embeddings,
+            batch_size=batch_size,
+            progress=lambda done: typer.echo(f"Exported {done} vibes...", err=True),
+        )
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    except DatabaseError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+
+    typer.echo(f"Exported {exported} vibes to {path}.")
+
+
+@app.command()
+def index(
+    strategy: str = typer.Option(None, help="hnsw, ivfflat, exact or auto; defaults to VECTOR_INDEX."),
+    lists: int = typer.Option(None, min=1, help="ivfflat lists; derived from the row count by default."),
+    probes: int = typer.Option(None, min=1, help="ivfflat probes; derived from --target-recall by default."),
+    target_recall: float = typer.Option(None, min=0.5, max=1.0),
+    m: int = typer.Option(None, min=2, help="HNSW max connections per node."),
+    ef_construction: int = typer.Option(None, min=4),
+    ef_search: int = typer.Option(None, min=1),
+    concurrently: bool = typer.Option(True, help="Build without blocking writes."),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only print the plan."),
+) -> None:
+    """Choose, size and rebuild the ANN index on vibes.embedding."""
+    try:
+        plan = indexing.plan_index(
+            strategy,
+            lists=lists,
+            probes=probes,
+            target_recall=target_recall,
+            m=m,
+            ef_construction=ef_construction,
+            ef_search=ef_search,
+        )
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    except DatabaseError as exc:
+        raise typer.Exit(code=1) from exc
+
+    typer.echo(f"Index plan: {plan.describe()}")
+    if dry_run:
+        return
+
+    try:
+        indexing.build_index(plan, concurrently=concurrently)
+    except DatabaseError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+
+    typer.echo("Index rebuilt; new pooled connections pick up the recorded search settings.")
+
+
+@app.command()
+def compact(
+    dimension: int = typer.Option(
+        None, min=1, help="Leading dimensions to keep; defaults to COMPACT_EMBEDDING_DIMENSION."
+    ),
+    batch_size: int = typer.Option(1000, min=1),
+    m: int = typer.Option(None, min=2, help="HNSW max connections per node."),
+    ef_construction: int = typer.Option(None, min=4),
+    drop_full_index: bool = typer.Option(
+        False, help="Drop the index on the full vector once the compact index exists."
+    ),
+) -> None:
+    """Add, backfill and index the compact halfvec copy of every embedding."""
+    try:
+        plan = indexing.plan_index("hnsw", m=m, ef_construction=ef_construction)
+        converted = storage.migrate_to_compact(
+            dimension,
+            batch_size=batch_size,
+            plan=plan,
+            drop_full_index=drop_full_index,
+            progress=lambda done: typer.echo(f"Converted {done} vibes..."),
+        )
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    except DatabaseError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+
+    typer.echo(
+        f"Converted {converted} vibes; set EMBEDDING_STORAGE=compact to search the compact index."
+    )
+
+
+@app.command()
+def bench(
+    config: Optional[List[str]] = typer.Option(
+        None,
+        "--config",
+        help="Index configuration such as 'hnsw:m=16,ef_search=80'; repeatable.",
+    ),
+    rows: int = typer.Option(10_000, min=1),
+    queries: int = typer.Option(200, min=1),
+    top_k: int = typer.Option(10, min=1, max=100),
+    dimension: int = typer.Option(256, min=2, max=2000),
+    candidate_multiplier: int = typer.Option(None, min=1),
+    output: Path = typer.Option(None, help="Write the JSON report here instead of stdout."),
+    keep_table: bool = typer.Option(False, help="Keep the vibes_bench table afterwards."),
+) -> None:
+    """Measure recall@k, QPS and latency percentiles per index configuration."""
+    try:
+        report = benchmark.run_benchmark(
+            config or benchmark.DEFAULT_CONFIGS,
+            rows=rows,
+            queries=queries,
+            top_k=top_k,
+            dimension=dimension,
+            candidate_multiplier=candidate_multiplier,
+            keep_table=keep_table,
+        )
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    except DatabaseError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+
+    payload = json.dumps(report.to_dict(), indent=2)
+    if output is None:
+        typer.echo(payload)
         return
 
-    for record in sorted(records, key=lambda v: v.uid.lower()):
-        typer.echo(record.uid)
+    output.write_text(payload + "\n", encoding="utf-8")
+    for result in report.results:
+        typer.echo(
+            f"{result.config}: recall@{top_k}={result.recall_at_k:.3f} "
+            f"rerank_recall@{top_k}={result.rerank_recall_at_k:.3f} qps={result.qps:.1f} "
+            f"p50={result.latency_ms['p50']:.2f}ms p99={result.latency_ms['p99']:.2f}ms"
+        )
+
+
+@app.command()
+def backfill_terms(batch_size: int = typer.Option(1000, min=1)) -> None:
+    """Compute stored lexical terms for vibes written before they existed."""
+    try:
+        updated = vibes.backfill_vibe_terms(batch_size=batch_size)
+    except DatabaseError as exc:
+        raise typer.Exit(code=1) from exc
+
+    typer.echo(f"Backfilled terms for {updated} vibes.")
+
+
+@app.command()
+def reembed(
+    batch_size: int = typer.Option(None, min=1, help="Rows per batch; defaults to EMBEDDING_BATCH_SIZE."),
+    rows_per_minute: int = typer.Option(None, min=1, help="Cap the embedding rate."),
+) -> None:
+    """Re-embed vibes stored with a model other than the active one."""
+    try:
+        updated = vibes.reembed_vibes(
+            batch_size=batch_size,
+            rows_per_minute=rows_per_minute,
+            progress=lambda done, total: typer.echo(f"Re-embedded {done}/{total} vibes..."),
+        )
+    except EmbeddingError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+    except DatabaseError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1) from exc
+
+    typer.echo(f"Re-embedded {updated} vibes.")
 
 
 @app.command()
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import httpx
+import openai
+import pytest
+
+from app.embedding_backends import is_input_error
+from app.embedding_dispatcher import EmbeddingDispatcher
+from app.errors import EmbeddingError
+
+
+def _api_error(error_type, status: int) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return error_type("error", response=httpx.Response(status, request=request), body=None)
+
+
+class FakeAPI:
+    """Records each multi-input request; ``bad`` texts make any request containing them
+    fail with an ``EmbeddingError`` caused by ``cause``."""
+
+    def __init__(self, *, delay: float = 0.0, bad=(), cause=None) -> None:
+        self.calls: List[List[str]] = []
+        self.delay = delay
+        self.bad = set(bad)
+        self.cause = cause
+
+    async def __call__(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        await asyncio.sleep(self.delay)
+        rejected = [text for text in texts if text in self.bad]
+        if rejected:
+            raise EmbeddingError(f"rejected {rejected}") from self.cause
+        return [[float(len(text))] for text in texts]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _dispatcher(api, *, window=0.01, max_batch=16, max_concurrency=4, **kwargs):
+    return EmbeddingDispatcher(
+        api, window=window, max_batch=max_batch, max_concurrency=max_concurrency, **kwargs
+    )
+
+
+def test_identical_concurrent_texts_share_one_request():
+    async def scenario():
+        api = FakeAPI(delay=0.01)
+        dispatcher = _dispatcher(api)
+        results = await asyncio.gather(*(dispatcher.embed("ducks") for _ in range(5)))
+        return api, results
+
+    api, results = _run(scenario())
+    assert api.calls == [["ducks"]]
+    assert results == [[5.0]] * 5
+
+
+def test_texts_within_window_are_batched():
+    async def scenario():
+        api = FakeAPI()
+        dispatcher = _dispatcher(api, window=0.05)
+        first = asyncio.ensure_future(dispatcher.embed("a"))
+        await asyncio.sleep(0.01)
+        results = await asyncio.gather(first, dispatcher.embed("bb"), dispatcher.embed("ccc"))
+        return api, results
+
+    api, results = _run(scenario())
+    assert api.calls == [["a", "bb", "ccc"]]
+    assert results == [[1.0], [2.0], [3.0]]
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    async def scenario():
+        api = FakeAPI()
+        dispatcher = _dispatcher(api, window=10.0, max_batch=2)
+        return api, await asyncio.wait_for(
+            asyncio.gather(dispatcher.embed("a"), dispatcher.embed("bb")), timeout=1.0
+        )
+
+    api, results = _run(scenario())
+    assert api.calls == [["a", "bb"]]
+    assert results == [[1.0], [2.0]]
+
+
+def test_texts_after_the_window_go_in_a_new_batch():
+    async def scenario():
+        api = FakeAPI()
+        dispatcher = _dispatcher(api, window=0.01)
+        await dispatcher.embed("a")
+        await dispatcher.embed("bb")
+        return api
+
+    assert _run(scenario()).calls == [["a"], ["bb"]]
+
+
+def test_failing_text_only_fails_its_own_caller():
+    async def scenario():
+        api = FakeAPI(bad={"bad"}, cause=_api_error(openai.BadRequestError, 400))
+        dispatcher = _dispatcher(api, input_error=is_input_error)
+        return api, await asyncio.gather(
+            dispatcher.embed("good"),
+            dispatcher.embed("bad"),
+            dispatcher.embed("fine"),
+            return_exceptions=True,
+        )
+
+    api, (good, bad, fine) = _run(scenario())
+    assert good == [4.0] and fine == [4.0]
+    assert isinstance(bad, EmbeddingError)
+    assert api.calls[0] == ["good", "bad", "fine"]
+    assert sorted(api.calls[1:]) == [["bad"], ["fine"], ["good"]]
+
+
+@pytest.mark.parametrize(
+    "cause",
+    [
+        _api_error(openai.AuthenticationError, 401),
+        _api_error(openai.PermissionDeniedError, 403),
+        _api_error(openai.NotFoundError, 404),
+        _api_error(openai.InternalServerError, 500),
+        None,  # e.g. a missing API key, raised before any request
+    ],
+)
+def test_non_input_failure_is_not_split(cause):
+    async def scenario():
+        api = FakeAPI(bad={"a"}, cause=cause)
+        dispatcher = _dispatcher(api, input_error=is_input_error)
+        return api, await asyncio.gather(
+            dispatcher.embed("a"), dispatcher.embed("b"), return_exceptions=True
+        )
+
+    api, results = _run(scenario())
+    assert api.calls == [["a", "b"]]
+    assert all(isinstance(result, EmbeddingError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_shared_request():
+    async def scenario():
+        api = FakeAPI(delay=0.05)
+        dispatcher = _dispatcher(api)
+        impatient = asyncio.ensure_future(dispatcher.embed("ducks"))
+        patient = asyncio.ensure_future(dispatcher.embed("ducks"))
+        await asyncio.sleep(0.02)
+        impatient.cancel()
+        return api, await patient
+
+    api, result = _run(scenario())
+    assert api.calls == [["ducks"]]
+    assert result == [5.0]
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_outstanding_requests_are_capped(max_concurrency):
+    async def scenario():
+        active = peak = 0
+
+        async def request(texts):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return [[0.0] for _ in texts]
+
+        dispatcher = _dispatcher(request, window=0.0, max_batch=1, max_concurrency=max_concurrency)
+        await asyncio.gather(*(dispatcher.embed(str(index)) for index in range(6)))
+        return peak
+
+    assert _run(scenario()) == max_concurrency
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# Generous enough for a cold CI runner; spaCy alone takes several times this.
+IMPORT_BUDGET_SECONDS = 1.5
+HEAVY_MODULES = ("spacy", "openai", "httpx")
+
+_SCRIPT = f"""
+import json, sys
+import app.vibes
+print(json.dumps(sorted(name for name in {HEAVY_MODULES!r} if name in sys.modules)))
+"""
+
+
+def _import_app_vibes():
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _SCRIPT],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout), completed.stderr
+
+
+def _cumulative_seconds(importtime_log: str, module: str) -> float:
+    for line in importtime_log.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+    raise AssertionError(f"{module} missing from -X importtime output")
+
+
+def test_app_vibes_does_not_import_heavy_dependencies():
+    loaded, _ = _import_app_vibes()
+    assert loaded == []
+
+
+def test_app_vibes_import_time_within_budget():
+    _, log = _import_app_vibes()
+    assert _cumulative_seconds(log, "app.vibes") < IMPORT_BUDGET_SECONDS
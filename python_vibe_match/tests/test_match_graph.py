@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.match_graph import (
+    WATERMARK_OVERLAP,
+    _affected_sources,
+    _changed_rows,
+    _score_sources,
+    _Snapshot,
+)
+from app.ranking import RankWeights, vibe_terms
+
+WEIGHTS = RankWeights(similarity=0.80, lexical=0.15, recency=0.05)
+TOP_K = 3
+WORDS = ["rubber", "ducks", "chess", "climbing", "jazz", "sourdough", "rust", "tango"]
+
+
+def _snapshot(rows):
+    """``rows`` are ``(uid, text, stamp, vector)``; vectors are normalized like _load_snapshot."""
+    matrix = np.array([vector for *_, vector in rows], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return _Snapshot(
+        uids=[uid for uid, *_ in rows],
+        texts=[text for _, text, *_ in rows],
+        terms=[vibe_terms(text) for _, text, *_ in rows],
+        timestamps=[stamp for _, _, stamp, _ in rows],
+        matrix=matrix,
+    )
+
+
+def _graph(records):
+    graph = {}
+    for uid, rank, match_uid, score, _ in records:
+        graph.setdefault(uid, []).append((rank, match_uid, round(score, 6)))
+    return {uid: sorted(matches) for uid, matches in graph.items()}
+
+
+def _full(snapshot, now, top_k=TOP_K):
+    # A pool spanning every other row keeps the candidate cut-off out of the comparison.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        sources = np.arange(len(snapshot.uids))
+        return _score_sources(
+            snapshot, sources, len(snapshot.uids) - 1, top_k, WEIGHTS, 4, executor, now
+        )
+
+
+def _incremental(previous, previous_records, snapshot, now, top_k=TOP_K):
+    """Apply an incremental refresh to ``previous_records`` the way refresh_match_graph does."""
+    current = {}
+    for uid, _, match_uid, score, _ in previous_records:
+        current.setdefault(uid, []).append((match_uid, score))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        changed = _changed_rows(snapshot, previous.watermark - WATERMARK_OVERLAP, current)
+        sources = _affected_sources(snapshot, changed, current, top_k, WEIGHTS, 4, executor, now)
+        records = _score_sources(
+            snapshot, sources, len(snapshot.uids) - 1, top_k, WEIGHTS, 4, executor, now
+        )
+
+    kept = set(snapshot.uids) - {snapshot.uids[index] for index in sources}
+    return [record for record in previous_records if record[0] in kept] + records, sources
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_refresh_matches_full_refresh(seed):
+    rng = np.random.default_rng(seed)
+    now = datetime(2026, 3, 1, tzinfo=UTC)
+    # Clustered vectors so sources have clear neighbourhoods.
+    centers = rng.normal(size=(8, 16))
+
+    def row(uid, stamp):
+        text = " ".join(rng.choice(WORDS, size=3))
+        vector = centers[rng.integers(len(centers))] + 0.3 * rng.normal(size=16)
+        return (uid, text, stamp, vector)
+
+    rows = [
+        row(f"u{index:03d}", now - timedelta(days=float(rng.uniform(1, 120))))
+        for index in range(60)
+    ]
+    before = _snapshot(rows)
+    before_records = _full(before, now)
+
+    later = now + timedelta(hours=1)
+    edited = rng.choice(len(rows), size=5, replace=False)
+    deleted = set(rng.choice(len(rows), size=3, replace=False)) - set(edited)
+    after_rows = [
+        row(uid, later - timedelta(minutes=1)) if index in edited else (uid, text, stamp, vector)
+        for index, (uid, text, stamp, vector) in enumerate(rows)
+        if index not in deleted
+    ]
+    after_rows += [row(f"new{index}", later - timedelta(minutes=2)) for index in range(3)]
+    after = _snapshot(after_rows)
+
+    # Both runs score at the same instant: recency drift between unchanged rows
+    # is what the periodic full refresh is for.
+    incremental, sources = _incremental(before, before_records, after, now)
+    assert _graph(incremental) == _graph(_full(after, now))
+    assert len(sources) < len(after.uids)
+
+
+def test_thresholds_use_current_recency():
+    t0 = datetime(2025, 1, 1, tzinfo=UTC)
+    t1 = t0 + timedelta(days=366)
+    source = ("source", "rubber ducks", t0 - timedelta(days=1), [1.0, 0.0, 0.0, 0.0])
+    match = ("match", "rubber ducks", t0 - timedelta(days=1), [0.9, np.sqrt(1 - 0.81), 0.0, 0.0])
+    unrelated = ("unrelated", "jazz", t0, [0.0, 0.0, 0.0, 1.0])
+    before = _snapshot([source, match, unrelated])
+    before_records = _full(before, t0, top_k=1)
+    assert _graph(before_records)["source"][0][1] == "match"
+
+    # Fresh and slightly less similar: below the score "match" had a year ago,
+    # above the score it has now that its recency has decayed.
+    challenger = ("challenger", "rubber ducks", t1, [0.85, 0.0, np.sqrt(1 - 0.7225), 0.0])
+    after = _snapshot([source, match, unrelated, challenger])
+
+    incremental, _ = _incremental(before, before_records, after, t1, top_k=1)
+    full = _graph(_full(after, t1, top_k=1))
+    assert full["source"][0][1] == "challenger"
+    assert _graph(incremental)["source"] == full["source"]
+
+
+def test_reembedded_rows_are_picked_up():
+    now = datetime(2026, 3, 1, tzinfo=UTC)
+    old = now - timedelta(days=30)
+    source = ("source", "rubber ducks", now - timedelta(days=2), [1.0, 0.0, 0.0, 0.0])
+    match = ("match", "rubber ducks", now - timedelta(days=2), [0.8, 0.6, 0.0, 0.0])
+    other = ("other", "jazz", now - timedelta(days=1), [0.0, 0.0, 1.0, 0.0])
+    before = _snapshot([source, match, other])
+    before_records = _full(before, now, top_k=1)
+
+    # Re-embedding moves a row onto the active model without touching its
+    # updated_at, so it predates the watermark.
+    reembedded = ("reembedded", "rubber ducks", old, [0.95, np.sqrt(1 - 0.9025), 0.0, 0.0])
+    after = _snapshot([source, match, other, reembedded])
+
+    incremental, _ = _incremental(before, before_records, after, now, top_k=1)
+    full = _graph(_full(after, now, top_k=1))
+    assert full["source"][0][1] == "reembedded"
+    assert _graph(incremental) == full
@@ -3,14 +3,30 @@
 """
 Simple demo script that fakes an embedding vector for the provided text.
 The script prints a JSON object to stdout, which the Symfony controller can parse.
+
+Run with ``--serve`` to keep a worker listening on a local HTTP port instead,
+so the controller avoids an interpreter start per request:
+
+    python3 scripts/run_demo.py --serve --port 8765
+
+``POST /batch`` accepts ``{"items": [{"op": "embed" | "normalize", "text": "..."}]}``
+and answers ``{"results": [...]}`` in the same order; each result is the
+single-shot payload or ``{"error": "..."}``. ``GET /health`` reports liveness.
 """
 
 from __future__ import annotations
 
+import argparse
 import json
 import math
 import sys
 from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+MAX_BATCH_ITEMS = 256
+MAX_BODY_BYTES = 1024 * 1024
 
 
 def generate_embedding(text: str) -> list[float]:
@@ -38,14 +54,117 @@ def generate_embedding(text: str) -> list[float]:
     return vector
 
 
-def main() -> None:
-    text = sys.argv[1] if len(sys.argv) > 1 else "Hello from Python"
-    payload = {
+def embed_payload(text: str) -> dict:
+    return {
         "text": text,
         "embedding": generate_embedding(text),
         "generated_at": datetime.now(tz=timezone.utc).isoformat(),
     }
-    print(json.dumps(payload))
+
+
+@lru_cache(maxsize=1)
+def _normalizer():
+    """Import ``python_vibe_match``'s spaCy normalizer once per worker."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "python_vibe_match"))
+    from app.text_normalization import normalize_text
+
+    return normalize_text
+
+
+def normalize_payload(text: str) -> dict:
+    try:
+        normalize_text = _normalizer()
+    except ImportError as exc:
+        return {"error": f"Normalization is unavailable: {exc}"}
+    try:
+        return {"text": text, "normalized": normalize_text(text)}
+    except Exception as exc:
+        return {"error": str(exc)}
+
+
+_OPERATIONS = {"embed": embed_payload, "normalize": normalize_payload}
+
+
+def run_batch(items: list) -> list[dict]:
+    results = []
+    for item in items:
+        operation = _OPERATIONS.get(item.get("op", "embed")) if isinstance(item, dict) else None
+        if operation is None or not isinstance(item.get("text"), str):
+            results.append({"error": "Each item needs a 'text' string and an 'op' of embed or normalize."})
+            continue
+        results.append(operation(item["text"]))
+    return results
+
+
+class WorkerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for clients that reuse connections
+
+    def _reply(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._reply(200, {"status": "ok"})
+        else:
+            self._reply(404, {"error": "Not found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/batch":
+            self._reply(404, {"error": "Not found"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._reply(413, {"error": "Request body too large"})
+            return
+        try:
+            items = json.loads(self.rfile.read(length) or b"{}").get("items")
+        except (ValueError, AttributeError):
+            items = None
+        if not isinstance(items, list) or len(items) > MAX_BATCH_ITEMS:
+            self._reply(400, {"error": f"Expected an 'items' list of at most {MAX_BATCH_ITEMS} entries"})
+            return
+
+        self._reply(200, {"results": run_batch(items)})
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - stdlib signature
+        pass
+
+
+def serve(host: str, port: int, warm: bool) -> None:
+    if warm:
+        _normalizer()("warm up")
+    server = ThreadingHTTPServer((host, port), WorkerHandler)
+    print(f"Demo worker listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("text", nargs="?", default="Hello from Python")
+    parser.add_argument("--serve", action="store_true", help="Run as a long-lived HTTP worker.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--warm", action="store_true", help="Load the spaCy normalizer before accepting requests."
+    )
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.host, args.port, args.warm)
+        return
+
+    print(json.dumps(embed_payload(args.text)))
 
 
 if __name__ == "__main__":
@@ -4,13 +4,17 @@ declare(strict_types=1);
 
 namespace App\Controller;
 
+use Psr\Log\LoggerInterface;
 use Symfony\Bundle\FrameworkBundle\Controller\AbstractController;
+use Symfony\Component\DependencyInjection\Attribute\Autowire;
 use Symfony\Component\HttpFoundation\JsonResponse;
 use Symfony\Component\HttpFoundation\Request;
 use Symfony\Component\HttpFoundation\Response;
 use Symfony\Component\Process\Exception\ProcessFailedException;
 use Symfony\Component\Process\Process;
 use Symfony\Component\Routing\Annotation\Route;
+use Symfony\Contracts\HttpClient\Exception\ExceptionInterface as HttpClientException;
+use Symfony\Contracts\HttpClient\HttpClientInterface;
 
 class DemoController extends AbstractController
 {
@@ -21,9 +25,26 @@ class DemoController extends AbstractController
     }
 
     #[Route(path: '/run-python', name: 'demo_run_python', methods: ['POST'])]
-    public function runPython(Request $request): JsonResponse
-    {
+    public function runPython(
+        Request $request,
+        HttpClientInterface $httpClient,
+        LoggerInterface $logger,
+        #[Autowire('%env(default::DEMO_WORKER_URL)%')] ?string $workerUrl = null,
+    ): JsonResponse {
         $text = (string) $request->request->get('text', 'Hello from Symfony');
+
+        if ($workerUrl) {
+            $decoded = $this->callWorker($httpClient, $logger, $workerUrl, $text);
+            if ($decoded !== null) {
+                return $this->json(
+                    [
+                        'success' => true,
+                        'data' => $decoded,
+                    ],
+                );
+            }
+        }
+
         $projectDir = (string) $this->getParameter('kernel.project_dir');
         $scriptPath = $projectDir . '/scripts/run_demo.py';
 
@@ -37,7 +58,7 @@ class DemoController extends AbstractController
             );
         }
 
-        $process = new Process(['python3', $scriptPath, $text]);
+        $process = new Process(['python3', $scriptPath, '--', $text]);
         $process->setTimeout(10);
 
         try {
@@ -75,4 +96,35 @@ class DemoController extends AbstractController
             ],
         );
     }
+
+    /**
+     * Ask the long-running `run_demo.py --serve` worker instead of spawning
+     * an interpreter; returns null so the caller falls back to the process.
+     */
+    private function callWorker(
+        HttpClientInterface $httpClient,
+        LoggerInterface $logger,
+        string $workerUrl,
+        string $text,
+    ): ?array {
+        try {
+            $payload = $httpClient->request('POST', rtrim($workerUrl, '/') . '/batch', [
+                'json' => ['items' => [['op' => 'embed', 'text' => $text]]],
+                'timeout' => 2,
+            ])->toArray();
+        } catch (HttpClientException $exception) {
+            $logger->warning('Python demo worker unavailable, spawning the script instead.', [
+                'error' => $exception->getMessage(),
+            ]);
+
+            return null;
+        }
+
+        $result = $payload['results'][0] ?? null;
+        if (!is_array($result) || isset($result['error'])) {
+            return null;
+        }
+
+        return $result;
+    }
 }